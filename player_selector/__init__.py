@@ -23,3 +23,9 @@ register(
     entry_point='player_selector.envs:PlayerSelector3Env', 
     max_episode_steps=200,
 )
+
+register(
+    id='Draft-v0', 
+    entry_point='player_selector.envs:DraftEnv', 
+    max_episode_steps=1000,
+)
@@ -0,0 +1,250 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import gym
+import numpy as np
+
+import player_selector
+from player_selector.envs.player_table import PlayerTable
+from player_selector.envs.playerselector3_env import POSITIONS
+from player_selector.envs.playerselector3_vec_env import PlayerSelector3VecEnv
+from player_selector.envs.draft_vec_env import DraftVecEnv
+from player_selector.envs.profiling import EnvProfiler
+from player_selector.rollout import RolloutRunner
+
+"""
+    Throughput benchmark for the registered player_selector envs.
+
+    For every env and roster size it reports
+        importSeconds       cold import of the env module in a fresh interpreter
+        entryPointSeconds   cold import of player_selector.envs plus resolving the env's
+                            entry point, as gym.make does in a new worker process
+        heavyModules        modules of HEAVY_MODULES loaded by that import
+        constructSeconds    construction of one env instance
+        bytesPerEnv         memory allocated per extra env instance (tracemalloc)
+        resetsPerSecond     env.reset() calls per second
+        stepsPerSecond      env.step() calls per second with random actions
+    in single env, batched (PlayerSelector3VecEnv, DraftVecEnv) and multi process
+    (RolloutRunner) mode. Rosters are synthetic, so any size can be used.
+    The 'profile' mode reports the per phase timings of EnvProfiler instead.
+
+    Usage:
+        python -m player_selector.benchmark --players 100 10000 100000 --output bench.json
+"""
+ENV_MODULES = {
+    'TeamCreator-v0': 'player_selector.envs.teamcreator_env',
+    'PlayerSelector-v0': 'player_selector.envs.playerselector_env',
+    'PlayerSelector2-v0': 'player_selector.envs.playerselector2_env',
+    'PlayerSelector3-v0': 'player_selector.envs.playerselector3_env',
+    'Draft-v0': 'player_selector.envs.draft_env',
+}
+ROSTER_ENVS = ('PlayerSelector2-v0', 'PlayerSelector3-v0', 'Draft-v0')
+BATCHED_ENVS = {'PlayerSelector3-v0': PlayerSelector3VecEnv, 'Draft-v0': DraftVecEnv}
+# per env arrays of the batched envs that grow with the roster, for bytesPerEnv
+BATCHED_STATE = {'PlayerSelector3-v0': ('selected', 'observations'), 'Draft-v0': ('owners', 'observations')}
+HEAVY_MODULES = ('pandas', 'six', 'gym.envs.toy_text')
+
+def syntheticPlayerTable(numPlayers, seed = 0):
+    rng = np.random.default_rng(seed)
+    return PlayerTable(
+            ['player{}'.format(i) for i in range(numPlayers)],
+            rng.integers(20, 250, numPlayers),
+            rng.integers(-20, 400, numPlayers),
+            rng.choice(len(POSITIONS), numPlayers, p=[0.1, 0.35, 0.3, 0.25]),
+            POSITIONS)
+
+def importTime(moduleName, repeats = 3):
+    """
+        Best of repeats cold import times, each in a new interpreter.
+    """
+    code = ("import time; t = time.perf_counter(); import {}; "
+            "print(time.perf_counter() - t)").format(moduleName)
+    times = []
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, '-c', code])
+        times.append(float(output.decode().strip().splitlines()[-1]))
+    return min(times)
+
+def entryPointImport(envId, repeats = 3):
+    """
+        Best of repeats cold timings of resolving the entry point of envId,
+        each in a new interpreter, and the heavy modules it pulled in.
+    """
+    moduleName, className = gym.envs.registry.spec(envId).entry_point.split(':')
+    code = ("import sys, time, json, gym; t = time.perf_counter(); import {0}; getattr({0}, {1!r}); "
+            "print(json.dumps([time.perf_counter() - t, sorted(m for m in {2!r} if m in sys.modules)]))"
+            ).format(moduleName, className, HEAVY_MODULES)
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, '-c', code])
+        runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+    return min(seconds for seconds, _ in runs), runs[0][1]
+
+def makeEnv(envId, players):
+    kwargs = {'players': players} if envId in ROSTER_ENVS else {}
+    return gym.make(envId, **kwargs)
+
+def randomActions(n, size, seed = 0):
+    return np.random.default_rng(seed).integers(0, n, size)
+
+def benchmarkSingle(envId, players, numSteps, numResets):
+    start = time.perf_counter()
+    env = makeEnv(envId, players)
+    constructSeconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    extra = [makeEnv(envId, players) for _ in range(10)]
+    bytesPerEnv = (tracemalloc.get_traced_memory()[0] - before) / len(extra)
+    tracemalloc.stop()
+    del extra
+
+    start = time.perf_counter()
+    for _ in range(numResets):
+        env.reset()
+    resetSeconds = time.perf_counter() - start
+
+    actions = randomActions(env.action_space.n, numSteps).tolist()
+    env.reset()
+    start = time.perf_counter()
+    for action in actions:
+        _, _, done, _ = env.step(action)
+        if done:
+            env.reset()
+    stepSeconds = time.perf_counter() - start
+    env.close()
+    return {
+        'mode': 'single',
+        'constructSeconds': constructSeconds,
+        'bytesPerEnv': bytesPerEnv,
+        'resetsPerSecond': numResets / resetSeconds,
+        'stepsPerSecond': numSteps / stepSeconds,
+    }
+
+def benchmarkBatched(envId, players, numSteps, numEnvs):
+    start = time.perf_counter()
+    env = BATCHED_ENVS[envId](numEnvs, players = players)
+    constructSeconds = time.perf_counter() - start
+    numBatches = max(numSteps // numEnvs, 1)
+    actions = randomActions(env.nA, (numBatches, numEnvs))
+
+    start = time.perf_counter()
+    env.reset()
+    resetSeconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for batch in actions:
+        env.step(batch)
+    stepSeconds = time.perf_counter() - start
+    env.close()
+    return {
+        'mode': 'batched',
+        'numEnvs': numEnvs,
+        'constructSeconds': constructSeconds,
+        'bytesPerEnv': sum(getattr(env, name).nbytes for name in BATCHED_STATE[envId]) / numEnvs,
+        'resetsPerSecond': numEnvs / resetSeconds,
+        'stepsPerSecond': numBatches * numEnvs / stepSeconds,
+    }
+
+def benchmarkMultiprocess(envId, players, numSteps, numEnvs, numWorkers):
+    envKwargs = {'players': players} if envId in ROSTER_ENVS else {}
+    start = time.perf_counter()
+    runner = RolloutRunner(envId, numEnvs, numWorkers, envKwargs)
+    runner.reset()
+    constructSeconds = time.perf_counter() - start
+    numBatches = max(numSteps // numEnvs, 1)
+    actions = randomActions(runner.action_space.n, (numBatches, numEnvs))
+
+    start = time.perf_counter()
+    for batch in actions:
+        runner.step(batch)
+    stepSeconds = time.perf_counter() - start
+    runner.close()
+    return {
+        'mode': 'multiprocess',
+        'numEnvs': numEnvs,
+        'numWorkers': runner.numWorkers,
+        'constructSeconds': constructSeconds,
+        'stepsPerSecond': numBatches * numEnvs / stepSeconds,
+    }
+
+def benchmarkProfile(envId, players, numSteps):
+    env = makeEnv(envId, players)
+    actions = randomActions(env.action_space.n, numSteps).tolist()
+    profiler = EnvProfiler(env).enable()
+    env.reset()
+    for action in actions:
+        _, _, done, _ = env.step(action)
+        if done:
+            env.reset()
+    profiler.disable()
+    env.close()
+    return {
+        'mode': 'profile',
+        'phases': profiler.stats(),
+    }
+
+def runBenchmarks(envIds, rosterSizes, modes, numSteps, numResets, numEnvs, numWorkers):
+    results = []
+    for envId in envIds:
+        importSeconds = importTime(ENV_MODULES[envId])
+        entryPointSeconds, heavyModules = entryPointImport(envId)
+        sizes = rosterSizes if envId in ROSTER_ENVS else [None]
+        for size in sizes:
+            players = syntheticPlayerTable(size) if size is not None else None
+            runs = []
+            if 'single' in modes:
+                runs.append(benchmarkSingle(envId, players, numSteps, numResets))
+            if 'batched' in modes and envId in BATCHED_ENVS:
+                runs.append(benchmarkBatched(envId, players, numSteps, numEnvs))
+            if 'multiprocess' in modes:
+                runs.append(benchmarkMultiprocess(envId, players, numSteps, numEnvs, numWorkers))
+            if 'profile' in modes:
+                runs.append(benchmarkProfile(envId, players, numSteps))
+            for run in runs:
+                run.update({'env': envId, 'numPlayers': size, 'importSeconds': importSeconds,
+                            'entryPointSeconds': entryPointSeconds, 'heavyModules': heavyModules})
+                results.append(run)
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'gym': gym.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description='Benchmark the player_selector envs')
+    parser.add_argument('--envs', nargs='+', default=list(ENV_MODULES))
+    parser.add_argument('--players', nargs='+', type=int, default=[100, 1000, 10000, 100000])
+    parser.add_argument('--modes', nargs='+', default=['single', 'batched', 'multiprocess'],
+                        choices=['single', 'batched', 'multiprocess', 'profile'])
+    parser.add_argument('--steps', type=int, default=20000)
+    parser.add_argument('--resets', type=int, default=2000)
+    parser.add_argument('--num-envs', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None, help='JSON file, stdout when not given')
+    args = parser.parse_args(argv)
+
+    report = {
+        'environment': environment(),
+        'results': runBenchmarks(args.envs, args.players, args.modes, args.steps,
+                                 args.resets, args.num_envs, args.workers),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return report
+
+if __name__ == '__main__':
+    main()
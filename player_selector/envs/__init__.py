@@ -1,4 +1,27 @@
-from player_selector.envs.teamcreator_env import TeamCreatorEnv
-from player_selector.envs.playerselector_env import PlayerSelectorEnv
-from player_selector.envs.playerselector2_env import PlayerSelector2Env
-from player_selector.envs.playerselector3_env import PlayerSelector3Env
\ No newline at end of file
+import importlib
+
+"""
+    The env classes are imported on first access, so a process that only
+    makes TeamCreator-v0 never loads the roster envs or pandas.
+"""
+ENV_CLASSES = {
+    'TeamCreatorEnv': 'player_selector.envs.teamcreator_env',
+    'PlayerSelectorEnv': 'player_selector.envs.playerselector_env',
+    'PlayerSelector2Env': 'player_selector.envs.playerselector2_env',
+    'PlayerSelector3Env': 'player_selector.envs.playerselector3_env',
+    'PlayerSelector3VecEnv': 'player_selector.envs.playerselector3_vec_env',
+    'DraftEnv': 'player_selector.envs.draft_env',
+    'DraftVecEnv': 'player_selector.envs.draft_vec_env',
+}
+
+__all__ = list(ENV_CLASSES)
+
+def __getattr__(name):
+    if name not in ENV_CLASSES:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    envClass = getattr(importlib.import_module(ENV_CLASSES[name]), name)
+    globals()[name] = envClass
+    return envClass
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
\ No newline at end of file
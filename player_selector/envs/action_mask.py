@@ -0,0 +1,70 @@
+import numpy as np
+
+"""
+    Valid action mask for the player selector envs, kept up to date per pick
+    instead of being recomputed from the whole roster.
+
+    An action is valid when the player
+        is available (PlayerTable.available),
+        is not selected yet,
+        fits in the current budget,
+        plays a position that is not full yet (PlayerSelector3Env).
+
+    Budget pruning uses the players sorted by value and a pointer to the end of
+    the affordable ones, so over an episode every player is switched off at
+    most once. After a roster update the value order changes, the env resets
+    the mask and closes its picks again.
+
+    A squad whose mask is empty before it is complete can not go on, the envs
+    end the episode there as a dead end (info['deadEnd']).
+"""
+
+def sortByValue(values):
+    """
+        Player indices sorted by value and the sorted values, cheapest first.
+    """
+    values = np.asarray(values)
+    order = np.argsort(values, kind='stable')
+    return order, values[order]
+
+class ActionMask(object):
+
+    def __init__(self, values, valueIndex = None, available = None):
+        if valueIndex is None:
+            valueIndex = sortByValue(values)
+        self.valueOrder, self.sortedValues = valueIndex
+        self.available = available
+        self.mask = np.ones(len(values), dtype=bool)
+        self.affordable = len(values)
+
+    def reset(self, budget):
+        if self.available is None:
+            self.mask[:] = True
+        else:
+            self.mask[:] = self.available
+        self.affordable = len(self.mask)
+        self.updateBudget(budget)
+
+    def pick(self, playerId, budget):
+        self.mask[playerId] = False
+        self.updateBudget(budget)
+
+    def closePlayers(self, playerIds):
+        self.mask[playerIds] = False
+
+    def any(self):
+        return bool(self.mask.any())
+
+    def updateBudget(self, budget):
+        end = int(np.searchsorted(self.sortedValues, budget, side='right'))
+        if end < self.affordable:
+            self.mask[self.valueOrder[end:self.affordable]] = False
+            self.affordable = end
+
+    def view(self):
+        """
+            Read only view of the mask, it changes with the next step.
+        """
+        mask = self.mask.view()
+        mask.setflags(write=False)
+        return mask
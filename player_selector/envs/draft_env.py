@@ -0,0 +1,277 @@
+import sys
+import gym
+from gym import spaces
+import numpy as np
+
+from player_selector.envs.action_mask import ActionMask
+from player_selector.envs.observation import ObservationBuffer
+from player_selector.envs.formation import POSITIONS, FORMATION_433, getFormation
+from player_selector.envs.player_table import PlayerTable, loadPlayerTable, SelectedPlayers
+from player_selector.envs.rendering import SquadRenderer, renderSquad
+from player_selector.envs.rng import makeGenerator
+from player_selector.envs.playerselector3_env import INITIAL_BUDGET, MAX_IMPOSSIBLE_SCORE, PLAYERS_FILE
+
+"""
+    Draft of numTeams squads from one shared roster, with the rules of
+    Player selector 3 for every team: own budget, own formation counts, a
+    player can only be drafted once.
+
+    Teams pick in turn, one env step is the pick of the team on the clock.
+    The turn order repeats every round,
+        'linear'    0, 1, ..., K-1, 0, 1, ...
+        'snake'     0, 1, ..., K-1, K-1, ..., 1, 0, 0, 1, ...
+    Finished teams are skipped.
+
+    Observation:
+        Type: Box(P + 4)
+        The PlayerSelector3Env observation of the team on the clock, followed by its
+        team index.
+        Num	Observation                         Min             Max
+        0	Number of selected players          0               11
+        1..P	Number of selected players per position
+        P+1	Current Budget                     -1500            1500
+        P+2	Current Score                      -10000           10000
+        P+3	Team on the clock                   0               numTeams - 1
+
+    Actions:
+        Type: Discrete(417)
+        The player picked by the team on the clock.
+
+    Episode Termination:
+        Every team is finished, a team is finished when it selected its squad,
+        went over budget or has no valid action left (dead end). A pick can leave
+        other teams without a valid action, every unfinished team is checked after it.
+
+    Rewards:
+        Rewards go to the team that picked, info['team'].
+        By selecting a player the team gets as much as the players score
+        Picking a drafted or unavailable player or a full position gives 0, the pick is ignored and
+        the same team is still on the clock
+        Going over budget gives -1000 and finishes the team
+        Completing the squad gives +500 and finishes the team
+        A pick that leaves the team in a dead end gives -1000 like going over budget,
+        other teams that end up in a dead end are finished without a reward
+
+    Info:
+        info['team'] is the team that picked, info['action_mask'] the valid actions of
+        the team on the clock now, the same as actionMask().
+        info['teamScores'] has the score of every team.
+        info['deadEnds'] lists the teams finished by a dead end in this step, when there are any.
+
+    Availability:
+        available is one boolean mask over the roster shared by all teams, a pick
+        clears one entry. The mask of a team is its own ActionMask (budget and full
+        positions) and'ed with available when it is asked for.
+        PlayerTable.update() rebuilds the team masks for the current squads, players
+        the roster marks unavailable can not be drafted.
+
+    Budgets:
+        budget is one budget for all teams or one per team.
+
+    See DraftVecEnv (draft_vec_env) for many drafts stepped together.
+"""
+ORDER_LINEAR = 'linear'
+ORDER_SNAKE = 'snake'
+NUM_TEAMS = 4
+
+def pickOrder(numTeams, order = ORDER_SNAKE):
+    """
+        Team indices of one cycle of the turn order, it repeats after that.
+    """
+    teams = np.arange(numTeams)
+    if order == ORDER_LINEAR:
+        return teams
+    if order == ORDER_SNAKE:
+        return np.concatenate([teams, teams[::-1]])
+    raise ValueError("Unknown pick order {!r}, expected {!r} or {!r}".format(order, ORDER_LINEAR, ORDER_SNAKE))
+
+def teamBudgets(budget, numTeams):
+    return np.array(np.broadcast_to(np.asarray(budget, dtype=np.float64), (numTeams,)))
+
+class DraftEnv(gym.Env):
+    metadata = {'render.modes': ['human', 'ansi', 'log']}
+    PROFILE_PHASES = {
+        'step': 'step',
+        'step.nextTeam': 'advanceTurn',
+        'step.observation': 'observe',
+        'step.actionMask': 'actionMask',
+        'reset': 'reset',
+    }
+
+    def readPlayerData(self, path = PLAYERS_FILE):
+        return loadPlayerTable(path, sep = ';', positionNames = POSITIONS)
+
+    def __init__(self, players = None, numTeams = NUM_TEAMS, formation = FORMATION_433, order = ORDER_SNAKE,
+                 budget = INITIAL_BUDGET, normalize = False, zeroCopy = False):
+        if not isinstance(players, PlayerTable):
+            players = self.readPlayerData(PLAYERS_FILE if players is None else players)
+        self.players = players
+        self.nA = len(self.players)
+        self.numTeams = numTeams
+        self.formation = getFormation(formation)
+        self.capacity = self.formation.compile(self.players.positionNames)
+        self.order = pickOrder(numTeams, order)
+        self.initialBudgets = teamBudgets(budget, numTeams)
+
+        self.available = np.ones(self.nA, dtype=bool)
+        self.positionCounts = np.zeros((numTeams, len(self.capacity)), dtype=np.int64)
+        self.budgets = self.initialBudgets.copy()
+        self.scores = np.zeros(numTeams, dtype=np.float64)
+        self.finished = np.zeros(numTeams, dtype=bool)
+        self.picks = [[] for _ in range(numTeams)]
+        valueIndex = self.players.valueIndex()
+        self.teamActions = [ActionMask(self.players.values, valueIndex, self.players.available)
+                            for _ in range(numTeams)]
+        self.maskBuffer = np.zeros(self.nA, dtype=bool)
+        self.renderers = [SquadRenderer(("#", "Player", "Position", "Value", "Score"),
+                                        "{:>2}  {:<24} {:<10} {:>8} {:>8}") for _ in range(numTeams)]
+
+        high = np.array([self.formation.squadSize]
+                        + self.capacity[:-1].tolist()
+                        + [max(self.initialBudgets.max(), 1), MAX_IMPOSSIBLE_SCORE, max(numTeams - 1, 1)])
+        self.observationBuffer = ObservationBuffer(high, normalize, zeroCopy)
+        self.state = np.zeros(len(high), dtype=np.float64)
+        self.action_space = spaces.Discrete(self.nA)
+        self.observation_space = self.observationBuffer.space
+
+        self.seed()
+        self.reset()
+        self.players.subscribe(self.onRosterUpdate)
+
+    def seed(self, seed = None):
+        self.np_random, seed = makeGenerator(seed)
+        return [seed]
+
+    @property
+    def team(self):
+        return int(self.order[self.turn])
+
+    def step(self, action):
+        team = self.team
+        reward = 0
+        done = False
+        players = self.players
+        playerPosition = players.positions[action]
+        positionCounts = self.positionCounts[team]
+        self.lastaction = action
+
+        if (not self.available[action] or not players.available[action]
+                or positionCounts[playerPosition] >= self.capacity[playerPosition]):
+            return self.observe(), reward, done, self.stepInfo(team)
+
+        self.available[action] = False
+        self.picks[team].append(action)
+        positionCounts[playerPosition] += 1
+        self.budgets[team] -= players.values[action]
+        self.scores[team] += players.scores[action]
+        reward = players.scores[action]
+        teamActions = self.teamActions[team]
+        teamActions.pick(action, self.budgets[team])
+        if positionCounts[playerPosition] >= self.capacity[playerPosition]:
+            teamActions.closePlayers(players.positionIds(playerPosition))
+
+        # Check done states of the team
+        if self.budgets[team] < 0:
+            reward = -1000
+            self.finished[team] = True
+        elif len(self.picks[team]) == self.formation.squadSize:
+            reward = 500
+            self.finished[team] = True
+        deadEnds = self.deadEndTeams()
+        if len(deadEnds):
+            if team in deadEnds:
+                reward = -1000
+            self.finished[deadEnds] = True
+        done = bool(self.finished.all())
+
+        if not done:
+            self.advanceTurn()
+        self.writeObservation()
+        info = self.stepInfo(team)
+        if len(deadEnds):
+            info['deadEnds'] = deadEnds
+        return self.observe(), reward, done, info
+
+    def deadEndTeams(self):
+        """
+            Unfinished teams without a valid action.
+        """
+        return np.array([team for team in np.flatnonzero(~self.finished)
+                         if not np.logical_and(self.teamActions[team].mask, self.available).any()],
+                        dtype=np.int64)
+
+    def advanceTurn(self):
+        cycle = len(self.order)
+        for offset in range(1, cycle + 1):
+            turn = (self.turn + offset) % cycle
+            if not self.finished[self.order[turn]]:
+                self.turn = turn
+                return
+
+    def writeObservation(self):
+        team = self.team
+        state = self.state
+        state[0] = len(self.picks[team])
+        state[1:-3] = self.positionCounts[team, :-1]
+        state[-3:] = (self.budgets[team], self.scores[team], team)
+        self.observationBuffer.write(state)
+
+    def observe(self):
+        return self.observationBuffer.read()
+
+    def actionMask(self):
+        """
+            Valid actions of the team on the clock, a read only view that changes with the next step.
+        """
+        np.logical_and(self.teamActions[self.team].mask, self.available, out=self.maskBuffer)
+        mask = self.maskBuffer.view()
+        mask.setflags(write=False)
+        return mask
+
+    def onRosterUpdate(self, playerIds):
+        for team, teamActions in enumerate(self.teamActions):
+            teamActions.available = self.players.available
+            teamActions.reset(self.budgets[team])
+            teamActions.closePlayers(self.picks[team])
+            for code in np.flatnonzero(self.positionCounts[team, :-1] >= self.capacity[:-1]):
+                teamActions.closePlayers(self.players.positionIds(code))
+
+    def stepInfo(self, team):
+        return {'team': team, 'action_mask': self.actionMask(), 'teamScores': self.scores.copy()}
+
+    def selectedNames(self, team):
+        return SelectedPlayers(self.players, tuple(self.picks[team]))
+
+    def mapPlayers(self, playerId):
+        players = self.players
+        return (players.names[playerId], players.positionName(playerId),
+                players.values[playerId], players.scores[playerId])
+
+    def reset(self, seed = None):
+        if seed is not None:
+            self.seed(seed)
+        self.available[:] = True
+        self.positionCounts[:] = 0
+        self.budgets[:] = self.initialBudgets
+        self.scores[:] = 0
+        self.finished[:] = False
+        for team in range(self.numTeams):
+            self.picks[team] = []
+            self.teamActions[team].reset(self.budgets[team])
+        self.turn = 0
+        self.lastaction = None
+        self.writeObservation()
+        return self.observe()
+
+    def render(self, mode='human', close=False):
+        frames = []
+        for team, renderer in enumerate(self.renderers):
+            footer = "Team {}  Budget {}  Score {}  ({}/{})".format(
+                    team, self.budgets[team], self.scores[team], len(self.picks[team]), self.formation.squadSize)
+            frames.append(renderSquad(renderer, self.picks[team], self.mapPlayers, footer,
+                                      'log' if mode == 'log' else 'ansi', None))
+        text = "".join(frames)
+        if mode == 'human':
+            sys.stdout.write(text)
+        else:
+            return text
\ No newline at end of file
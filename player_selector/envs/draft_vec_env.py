@@ -0,0 +1,234 @@
+from gym import spaces
+from gym.vector import VectorEnv
+import numpy as np
+
+from player_selector.envs.player_table import PlayerTable, loadPlayerTable
+from player_selector.envs.formation import POSITIONS, FORMATION_433, getFormation
+from player_selector.envs.playerselector3_env import INITIAL_BUDGET, MAX_IMPOSSIBLE_SCORE, PLAYERS_FILE
+from player_selector.envs.draft_env import ORDER_SNAKE, NUM_TEAMS, pickOrder, teamBudgets
+from player_selector.envs.rng import makeGenerator
+
+"""
+    Batched version of the draft env, num_envs drafts over one shared roster
+    stepped together. The rules are exactly the same as DraftEnv.
+    The roster arrays are read on every step, PlayerTable.update() changes apply
+    to the next step without any listener.
+
+    State per draft:
+        owners          (num_envs, nA)      int16, team that drafted the player, -1 when
+                                            available, the availability mask of the draft
+        positionCounts  (num_envs, K, P+1)  selected players per team and position, the last
+                                            column counts players without a known position
+        playersCount    (num_envs, K)       selected players per team
+        budget          (num_envs, K)       current budget per team
+        score           (num_envs, K)       current score per team
+        finished        (num_envs, K)       teams that are done
+        turn            (num_envs,)         index into the turn order cycle
+
+    Observation:
+        Type: Box(num_envs, P + 4)
+        Same columns as DraftEnv, one row per draft for its team on the clock.
+
+    Actions:
+        Type: MultiDiscrete([nA] * num_envs)
+        One pick per draft, for its team on the clock.
+
+    Episode Termination:
+        Same as DraftEnv, plus maxEpisodeSteps picks per draft.
+        Finished drafts are reset automatically, the last observation is returned in
+        info['terminal_observation'] and the final team scores in info['terminal_scores'].
+        info['deadEnds'] is a (len(rows), K) bool array of the teams finished by a dead end
+        in this step, when there are any.
+        info['team'] always has the team that picked in every draft.
+"""
+MAX_EPISODE_STEPS = 1000
+
+class DraftVecEnv(VectorEnv):
+
+    def readPlayerData(self, path = PLAYERS_FILE):
+        return loadPlayerTable(path, sep = ';', positionNames = POSITIONS)
+
+    def __init__(self, num_envs, numTeams = NUM_TEAMS, order = ORDER_SNAKE, maxEpisodeSteps = MAX_EPISODE_STEPS,
+                 players = None, formation = FORMATION_433, budget = INITIAL_BUDGET):
+        if not isinstance(players, PlayerTable):
+            players = self.readPlayerData(PLAYERS_FILE if players is None else players)
+        self.players = players
+        self.nA = len(self.players)
+        self.numTeams = numTeams
+        self.order = pickOrder(numTeams, order)
+        self.maxEpisodeSteps = maxEpisodeSteps
+        self.formation = getFormation(formation)
+        # per position code plus the unlimited last entry of players without a known position
+        self.capacity = self.formation.compile(self.players.positionNames)
+        self.initialBudgets = teamBudgets(budget, numTeams)
+        numPositions = len(self.capacity)
+
+        high = np.array([self.formation.squadSize]
+                        + self.capacity[:-1].tolist()
+                        + [max(self.initialBudgets.max(), 1), MAX_IMPOSSIBLE_SCORE, max(numTeams - 1, 1)])
+
+        super(DraftVecEnv, self).__init__(
+                num_envs,
+                spaces.Box(-high, high, dtype=np.float32),
+                spaces.Discrete(self.nA))
+
+        self.rows = np.arange(num_envs)
+        self.owners = np.full((num_envs, self.nA), -1, dtype=np.int16)
+        self.positionCounts = np.zeros((num_envs, numTeams, numPositions), dtype=np.int64)
+        self.playersCount = np.zeros((num_envs, numTeams), dtype=np.int64)
+        self.budget = np.zeros((num_envs, numTeams), dtype=np.float64)
+        self.score = np.zeros((num_envs, numTeams), dtype=np.float64)
+        self.finished = np.zeros((num_envs, numTeams), dtype=bool)
+        self.turn = np.zeros(num_envs, dtype=np.int64)
+        self.elapsedSteps = np.zeros(num_envs, dtype=np.int64)
+        self.lastaction = np.full(num_envs, -1, dtype=np.int64)
+        self.observations = np.zeros((num_envs, len(high)), dtype=np.float32)
+        # turn offsets 1..cycle, to find the next unfinished team of many drafts at once
+        self.turnOffsets = np.arange(1, len(self.order) + 1)
+        self._actions = None
+        self.seed()
+        self.resetRows(self.rows)
+
+    def seed(self, seed = None):
+        self.np_random, seed = makeGenerator(seed)
+        return [seed]
+
+    def reset(self, seed = None):
+        if seed is not None:
+            self.seed(seed)
+        return super(DraftVecEnv, self).reset()
+
+    def resetRows(self, rows):
+        self.owners[rows] = -1
+        self.positionCounts[rows] = 0
+        self.playersCount[rows] = 0
+        self.budget[rows] = self.initialBudgets
+        self.score[rows] = 0
+        self.finished[rows] = False
+        self.turn[rows] = 0
+        self.elapsedSteps[rows] = 0
+        self.lastaction[rows] = -1
+
+    def teams(self, rows):
+        return self.order[self.turn[rows]]
+
+    def observeRows(self, rows):
+        teams = self.teams(rows)
+        obs = np.empty((len(rows), self.observations.shape[1]), dtype=np.float32)
+        obs[:, 0] = self.playersCount[rows, teams]
+        obs[:, 1:-3] = self.positionCounts[rows, teams, :-1]
+        obs[:, -3] = self.budget[rows, teams]
+        obs[:, -2] = self.score[rows, teams]
+        obs[:, -1] = teams
+        return obs
+
+    def observe(self):
+        self.observations[:] = self.observeRows(self.rows)
+        return self.observations.copy()
+
+    def reset_wait(self, **kwargs):
+        self.resetRows(self.rows)
+        return self.observe()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.int64)
+
+    def step_wait(self, **kwargs):
+        actions = self._actions
+        self._actions = None
+        return self.stepRows(self.rows, actions)
+
+    def stepRows(self, rows, actions):
+        """
+            Step only the drafts in rows (no duplicates) with one pick each for their
+            team on the clock. Returns observations, rewards, dones and infos for rows.
+        """
+        players = self.players
+        teams = self.teams(rows)
+        positions = players.positions[actions]
+        playerTaken = self.owners[rows, actions] >= 0
+        positionOverflow = self.positionCounts[rows, teams, positions] == self.capacity[positions]
+        valid = ~(playerTaken | positionOverflow) & players.available[actions]
+
+        # Invalid picks are ignored with a reward of 0, the same team stays on the clock
+        validRows = rows[valid]
+        validTeams = teams[valid]
+        validActions = actions[valid]
+        self.owners[validRows, validActions] = validTeams
+        self.positionCounts[validRows, validTeams, positions[valid]] += 1
+        self.playersCount[validRows, validTeams] += 1
+        self.budget[validRows, validTeams] -= players.values[validActions]
+        self.score[validRows, validTeams] += players.scores[validActions]
+        self.lastaction[rows] = actions
+        self.elapsedSteps[rows] += 1
+
+        rewards = np.where(valid, players.scores[actions], 0.0)
+
+        # Check done states of the teams that picked
+        overBudget = valid & (self.budget[rows, teams] < 0)
+        squadComplete = valid & ~overBudget & (self.playersCount[rows, teams] == self.formation.squadSize)
+        rewards[overBudget] = -1000
+        rewards[squadComplete] = 500
+        self.finished[rows[overBudget | squadComplete], teams[overBudget | squadComplete]] = True
+
+        # A pick can leave any unfinished team of its draft without a valid action
+        deadEnds = np.zeros((len(rows), self.numTeams), dtype=bool)
+        if valid.any():
+            deadEnds[valid] = ~self.finished[validRows] & ~self.teamMasks(validRows).any(axis=2)
+            pickerDeadEnd = deadEnds[np.arange(len(rows)), teams]
+            rewards[pickerDeadEnd] = -1000
+            self.finished[rows] |= deadEnds
+        draftComplete = self.finished[rows].all(axis=1)
+        timeLimit = self.elapsedSteps[rows] >= self.maxEpisodeSteps
+        dones = draftComplete | timeLimit
+
+        # Next unfinished team in the turn order of the drafts that go on
+        moving = valid & ~dones
+        if moving.any():
+            movingRows = rows[moving]
+            cycle = len(self.order)
+            turns = (self.turn[movingRows, None] + self.turnOffsets) % cycle
+            waiting = ~self.finished[movingRows[:, None], self.order[turns]]
+            self.turn[movingRows] = turns[np.arange(len(movingRows)), waiting.argmax(axis=1)]
+
+        obs = self.observe() if rows is self.rows else self.observeRows(rows)
+        infos = {'team': teams}
+        if deadEnds.any():
+            infos['deadEnds'] = deadEnds
+        if dones.any():
+            doneRows = rows[dones]
+            infos['terminal_observation'] = obs[dones]
+            infos['terminal_rows'] = doneRows
+            infos['terminal_scores'] = self.score[doneRows]
+            infos['TimeLimit.truncated'] = timeLimit[dones] & ~draftComplete[dones]
+            self.resetRows(doneRows)
+            obs[dones] = self.observeRows(doneRows)
+        return obs, rewards, dones, infos
+
+    def actionMasks(self):
+        """
+            (num_envs, nA) valid actions of the team on the clock of every draft.
+        """
+        players = self.players
+        teams = self.teams(self.rows)
+        positionFull = self.positionCounts[self.rows, teams] >= self.capacity
+        return ((self.owners < 0)
+                & players.available
+                & (players.values[None, :] <= self.budget[self.rows, teams][:, None])
+                & ~positionFull[:, players.positions])
+
+    def teamMasks(self, rows):
+        """
+            (len(rows), K, nA) valid actions of every team of the drafts in rows.
+        """
+        players = self.players
+        positionFull = self.positionCounts[rows] >= self.capacity
+        return (((self.owners[rows] < 0) & players.available)[:, None, :]
+                & (players.values <= self.budget[rows][:, :, None])
+                & ~positionFull[:, :, players.positions])
+
+    def close_extras(self, **kwargs):
+        pass
+
+    def selectedPlayers(self, row, team):
+        return [self.players.names[i] for i in np.flatnonzero(self.owners[row] == team)]
@@ -0,0 +1,91 @@
+import numpy as np
+
+"""
+    Formations for the position based player selector envs.
+    A formation gives the number of slots of every position and the squad size.
+    compile() turns it into a capacity array indexed by position code, so
+    overflow checks and count updates are one array lookup for any number
+    of positions. The last entry is for players without a known position
+    (code -1), which never overflow, like in the original PlayerSelector3Env.
+
+    Formations are small and independent of the roster, so any number of
+    them can be used with one shared PlayerTable.
+
+    Examples:
+        Formation.parse("4-3-3")                        1 GK, 4 DF, 3 MF, 3 ST
+        Formation.parse("3-5-2", bench={POSITION_GK: 1, POSITION_DF: 1, POSITION_MF: 1, POSITION_ST: 1})
+        Formation({POSITION_GK: 2, POSITION_DF: 5, POSITION_MF: 5, POSITION_ST: 3})
+                                                        15 man fantasy squad
+        Formation({...}, squadSize=11)                  at most the given slots, 11 players
+"""
+POSITION_GK = "goalkeeper"
+POSITION_DF = "defender"
+POSITION_MF = "midfielder"
+POSITION_ST = "attacker"
+POSITIONS = (POSITION_GK, POSITION_DF, POSITION_MF, POSITION_ST)
+
+class Formation(object):
+
+    def __init__(self, slots, squadSize = None, name = None):
+        self.slots = dict(slots)
+        totalSlots = sum(self.slots.values())
+        self.squadSize = totalSlots if squadSize is None else squadSize
+        if not 0 < self.squadSize <= totalSlots:
+            raise ValueError("Squad size {} does not fit in {} slots".format(self.squadSize, totalSlots))
+        self.name = name or "-".join(str(self.slots.get(position, 0)) for position in POSITIONS)
+        self._compiled = {}
+
+    @classmethod
+    def parse(cls, spec, bench = None, goalkeepers = 1, name = None):
+        """
+            Formation from the usual "DF-MF-ST" notation, plus bench slots per position.
+        """
+        counts = [int(count) for count in spec.split("-")]
+        if len(counts) != 3:
+            raise ValueError("Expected a DF-MF-ST formation, got {!r}".format(spec))
+        slots = dict(zip(POSITIONS, [goalkeepers] + counts))
+        for position, extra in (bench or {}).items():
+            slots[position] = slots.get(position, 0) + extra
+        if name is None and bench:
+            name = "{}+{}".format(spec, sum(bench.values()))
+        return cls(slots, name = name or spec)
+
+    def compile(self, positionNames = POSITIONS):
+        """
+            Capacity per position code of positionNames, plus the unlimited last entry.
+        """
+        positionNames = tuple(positionNames)
+        capacity = self._compiled.get(positionNames)
+        if capacity is None:
+            unknown = set(self.slots) - set(positionNames)
+            if unknown:
+                raise ValueError("Positions {} are not in the roster".format(sorted(unknown)))
+            capacity = np.array([self.slots.get(position, 0) for position in positionNames]
+                                + [self.squadSize], dtype=np.int64)
+            capacity.setflags(write=False)
+            self._compiled[positionNames] = capacity
+        return capacity
+
+    def capacities(self, positionNames = POSITIONS):
+        return self.compile(positionNames)[:-1]
+
+    def __repr__(self):
+        return "Formation({!r}, squadSize={})".format(self.name, self.squadSize)
+
+FORMATION_433 = Formation.parse("4-3-3")
+FORMATION_442 = Formation.parse("4-4-2")
+FORMATION_352 = Formation.parse("3-5-2")
+FORMATION_FANTASY_15 = Formation({POSITION_GK: 2, POSITION_DF: 5, POSITION_MF: 5, POSITION_ST: 3}, name = "fantasy-15")
+
+FORMATIONS = dict((formation.name, formation) for formation in
+                  (FORMATION_433, FORMATION_442, FORMATION_352, FORMATION_FANTASY_15))
+
+def getFormation(formation):
+    """
+        Formation instance, or a registered name like "4-4-2", or a "DF-MF-ST" spec.
+    """
+    if isinstance(formation, Formation):
+        return formation
+    if formation in FORMATIONS:
+        return FORMATIONS[formation]
+    return Formation.parse(formation)
@@ -0,0 +1,38 @@
+import numpy as np
+from gym import spaces
+
+"""
+    Observation output of the player selector envs.
+
+    The env state stays a tuple, every change is written once into a
+    preallocated float32 buffer of the same length as observation_space.
+    With normalize the buffer is divided by the high bounds, so the values
+    fall in [-1, 1] and the space becomes Box(-1, 1).
+
+    read() returns a copy of the buffer, with zeroCopy it returns the same
+    read only view every time instead, which changes with the next step or
+    reset. Copy it before keeping it, e.g. in a replay buffer.
+"""
+
+class ObservationBuffer(object):
+
+    def __init__(self, high, normalize = False, zeroCopy = False):
+        high = np.asarray(high, dtype=np.float64)
+        self.buffer = np.zeros(len(high), dtype=np.float32)
+        self.scale = (1.0 / high).astype(np.float32) if normalize else None
+        self.zeroCopy = zeroCopy
+        self.view = self.buffer.view()
+        self.view.setflags(write=False)
+        if normalize:
+            self.space = spaces.Box(-1.0, 1.0, shape=high.shape, dtype=np.float32)
+        else:
+            self.space = spaces.Box(-high, high, dtype=np.float32)
+
+    def write(self, state):
+        buffer = self.buffer
+        buffer[:] = state
+        if self.scale is not None:
+            np.multiply(buffer, self.scale, out=buffer)
+
+    def read(self):
+        return self.view if self.zeroCopy else self.buffer.copy()
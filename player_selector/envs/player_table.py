@@ -0,0 +1,383 @@
+import os
+import weakref
+from collections.abc import Sequence
+from multiprocessing import shared_memory
+import numpy as np
+
+"""
+    Columnar player table shared by the CSV based player selector envs.
+    The CSV is parsed once per process, every env built from the same file
+    gets the same PlayerTable instance.
+
+    Columns:
+        names       list of player names, index is the action
+        values      float64 array, player value (cost)
+        scores      float64 array, player score
+        positions   int64 array, index into positionNames, -1 if unknown
+        available   bool array, False for players that can not be picked (injured, sold)
+        scoreSamples    optional float64 matrix (players, matchdays * scenarios), score of
+                    every player on every matchday of every scenario, sampleShape is
+                    (matchdays, scenarios), see scenario_scoring
+
+    The arrays are read only since they are shared between environments.
+    readPlayerTable streams a CSV in chunks, parsing only the needed columns
+    and filtering rows on the way, so big rosters load with bounded memory.
+    loadPlayerTable goes through the binary roster cache of roster_cache,
+    so a CSV is only parsed again when it changes.
+    sharePlayerTable/attachPlayerTable put the arrays in shared memory so
+    worker processes map the same roster instead of each loading a copy.
+
+    Live updates:
+        update() changes values, scores and availability of some players in place
+        and bumps version. The cached value index is patched, then every
+        subscribed listener is called with the changed player ids, the envs use
+        it to fix their action masks and roster features without a reload.
+        Columns that can not be written (a memory mapped roster cache) are copied
+        once on the first update. Shared memory columns are written in place, the
+        other processes see the new values but run their listeners only when they
+        call update() themselves.
+        An episode in progress keeps the budget and score it already has, new
+        values and scores count from the next pick on.
+        A table with scoreSamples gets new samples with its new scores, the
+        cached seasonScores are patched in place like the value index.
+"""
+NO_POSITION = -1
+PLAYER_COLUMNS = ('name', 'position', 'value', 'score')
+COLUMN_DTYPES = {'name': str, 'position': 'category', 'value': np.float64, 'score': np.float64}
+CHUNK_SIZE = 100000
+
+_loadedTables = {}
+
+class PlayerTable(object):
+
+    def __init__(self, names, values, scores, positions = None, positionNames = (),
+                 scoreSamples = None, available = None):
+        self.names = names if isinstance(names, Sequence) else list(names)
+        self.values = self.readOnly(np.ascontiguousarray(values, dtype=np.float64))
+        self.scores = self.readOnly(np.ascontiguousarray(scores, dtype=np.float64))
+        if positions is None:
+            positions = np.full(len(self.names), NO_POSITION, dtype=np.int64)
+        self.positions = self.readOnly(np.ascontiguousarray(positions, dtype=np.int64))
+        self.positionNames = tuple(positionNames)
+        if available is None:
+            available = np.ones(len(self.names), dtype=bool)
+        self.available = self.readOnly(np.ascontiguousarray(available, dtype=bool))
+        self.version = 0
+        self.listeners = []
+        self.scoreSamples = None
+        self.sampleShape = None
+        if scoreSamples is not None:
+            self.setScoreSamples(scoreSamples)
+
+    def setScoreSamples(self, scoreSamples):
+        """
+            scoreSamples is (players, matchdays, scenarios), a 2-D array is one scenario.
+        """
+        scoreSamples = np.asarray(scoreSamples, dtype=np.float64)
+        if scoreSamples.ndim == 2:
+            scoreSamples = scoreSamples[:, :, None]
+        if scoreSamples.ndim != 3 or len(scoreSamples) != len(self.names):
+            raise ValueError("scoreSamples has to be (players, matchdays, scenarios), got {} for {} players"
+                             .format(scoreSamples.shape, len(self.names)))
+        self.sampleShape = scoreSamples.shape[1:]
+        self.scoreSamples = self.readOnly(np.ascontiguousarray(scoreSamples.reshape(len(self.names), -1)))
+
+    def withScoreSamples(self, scoreSamples):
+        """
+            The same roster with score samples. values, scores and availability are
+            copied, update() on either table leaves the other one as it was.
+        """
+        return PlayerTable(self.names, np.array(self.values), np.array(self.scores), self.positions,
+                           self.positionNames, scoreSamples, np.array(self.available))
+
+    @staticmethod
+    def readOnly(array):
+        array.setflags(write=False)
+        return array
+
+    @classmethod
+    def fromDataFrame(cls, data, positionNames = ()):
+        positions = None
+        if 'position' in data.columns:
+            positions = encodePositions(data['position'].to_numpy(), positionNames)
+        return cls(data['name'].tolist(), data['value'].to_numpy(), data['score'].to_numpy(),
+                   positions, positionNames)
+
+    def __len__(self):
+        return len(self.names)
+
+    def positionIds(self, code):
+        """
+            Indices of the players with position code, computed once per table.
+        """
+        cache = self.__dict__.setdefault('_positionIds', {})
+        ids = cache.get(code)
+        if ids is None:
+            ids = cache[code] = self.readOnly(np.flatnonzero(self.positions == code))
+        return ids
+
+    def valueIndex(self):
+        """
+            Player indices sorted by value and the sorted values, cheapest first,
+            computed once per table.
+        """
+        index = self.__dict__.get('_valueIndex')
+        if index is None:
+            order = np.argsort(self.values, kind='stable')
+            index = self._valueIndex = (self.readOnly(order), self.readOnly(self.values[order]))
+        return index
+
+    def seasonScores(self):
+        """
+            (players, scenarios) score of every player summed over the matchdays,
+            computed once per table.
+        """
+        scores = self.__dict__.get('_seasonScores')
+        if scores is None:
+            samples = self.scoreSamples.reshape((len(self.names),) + tuple(self.sampleShape))
+            scores = self._seasonScores = self.readOnly(samples.sum(axis=1))
+        return scores
+
+    def subscribe(self, listener):
+        """
+            Call listener(playerIds) after every update(). Bound methods are held weakly,
+            so a subscribed env can still be garbage collected.
+        """
+        if hasattr(listener, '__self__'):
+            self.listeners.append(weakref.WeakMethod(listener))
+        else:
+            self.listeners.append(lambda: listener)
+
+    def update(self, playerIds, values = None, scores = None, available = None, scoreSamples = None):
+        """
+            Set the value, score and/or availability of playerIds, each a scalar or one
+            entry per player in the order of playerIds. Returns the new version.
+            A table with score samples needs scoreSamples, (players, matchdays, scenarios)
+            in the order of playerIds, whenever scores change.
+        """
+        ids = np.asarray(playerIds, dtype=np.int64).ravel()
+        if self.scoreSamples is None and scoreSamples is not None:
+            raise ValueError("The player table has no score samples to update")
+        if self.scoreSamples is not None and scores is not None and scoreSamples is None:
+            raise ValueError("The player table has score samples, update them together with the scores")
+        if scoreSamples is not None:
+            scoreSamples = np.asarray(scoreSamples, dtype=np.float64).reshape(len(ids), -1)
+            if scoreSamples.shape[1] != self.scoreSamples.shape[1]:
+                raise ValueError("scoreSamples has to be {} per player, got {}".format(
+                        tuple(self.sampleShape), scoreSamples.shape[1]))
+        for column, new in (('values', values), ('scores', scores), ('available', available)):
+            if new is not None:
+                new = np.broadcast_to(new, ids.shape)
+                array = self.writableColumn(column)
+                array[ids] = new
+                self.readOnly(array)
+        if scoreSamples is not None:
+            array = self.writableColumn('scoreSamples')
+            array[ids] = scoreSamples
+            self.readOnly(array)
+        # listeners and the cached indexes only need every changed player once
+        playerIds = np.unique(ids)
+        if scoreSamples is not None:
+            self.updateSeasonScores(playerIds)
+        if values is not None:
+            self.updateValueIndex(playerIds)
+        self.version += 1
+        listeners = []
+        for ref in self.listeners:
+            listener = ref()
+            if listener is not None:
+                listeners.append(ref)
+                listener(playerIds)
+        self.listeners = listeners
+        return self.version
+
+    def writableColumn(self, column):
+        array = getattr(self, column)
+        try:
+            array.setflags(write=True)
+        except ValueError:
+            # read only memory map of the roster cache, this process continues on a copy
+            array = np.array(array)
+            setattr(self, column, array)
+        return array
+
+    def updateSeasonScores(self, playerIds):
+        """
+            Recompute the cached season scores of playerIds in place, ScenarioScoring holds on to them.
+        """
+        seasonScores = self.__dict__.get('_seasonScores')
+        if seasonScores is None:
+            return
+        samples = self.scoreSamples[playerIds].reshape((len(playerIds),) + tuple(self.sampleShape))
+        seasonScores.setflags(write=True)
+        seasonScores[playerIds] = samples.sum(axis=1)
+        self.readOnly(seasonScores)
+
+    def updateValueIndex(self, playerIds):
+        """
+            Move the changed players to their new place in the cached value order,
+            the arrays are patched in place since action masks hold on to them.
+        """
+        index = self.__dict__.get('_valueIndex')
+        if index is None:
+            return
+        order, sortedValues = index
+        changed = np.zeros(len(self.names), dtype=bool)
+        changed[playerIds] = True
+        keep = order[~changed[order]]
+        keepValues = self.values[keep]
+        moved = playerIds[np.argsort(self.values[playerIds], kind='stable')]
+        movedValues = self.values[moved]
+        at = np.searchsorted(keepValues, movedValues, side='right')
+        for array, new in ((order, np.insert(keep, at, moved)), (sortedValues, np.insert(keepValues, at, movedValues))):
+            array.setflags(write=True)
+            array[:] = new
+            self.readOnly(array)
+
+    def positionName(self, playerId):
+        code = self.positions[playerId]
+        return None if code == NO_POSITION else self.positionNames[code]
+
+def encodePositions(positions, positionNames):
+    codes = np.full(len(positions), NO_POSITION, dtype=np.int64)
+    for code, position in enumerate(positionNames):
+        codes[positions == position] = code
+    return codes
+
+def readPlayerTable(source, sep = ',', positionNames = (), chunksize = CHUNK_SIZE,
+                    where = None, predicate = None, columns = ()):
+    """
+        Stream a roster CSV into a PlayerTable, source is a path or a file object.
+        where maps a column to the accepted values, e.g. {'league': ['EPL'], 'season': [2019]}.
+        predicate gets every chunk as a DataFrame and returns a boolean mask of the rows to keep,
+        the extra columns it needs are listed in columns.
+    """
+    # pandas is only needed to parse CSVs, binary rosters and shared tables load without it
+    import pandas as pd
+    where = where or {}
+    wanted = set(PLAYER_COLUMNS) | set(where) | set(columns)
+    chunks = pd.read_csv(source, sep = sep, chunksize = chunksize,
+                         usecols = lambda column: column in wanted,
+                         dtype = COLUMN_DTYPES)
+    names, values, scores, positions = [], [], [], []
+    for chunk in chunks:
+        keep = np.ones(len(chunk), dtype=bool)
+        for column, accepted in where.items():
+            keep &= chunk[column].isin(accepted).to_numpy()
+        if predicate is not None:
+            keep &= np.asarray(predicate(chunk), dtype=bool)
+        if not keep.all():
+            chunk = chunk[keep]
+        names.extend(chunk['name'].tolist())
+        values.append(chunk['value'].to_numpy())
+        scores.append(chunk['score'].to_numpy())
+        if 'position' in chunk.columns:
+            positions.append(encodePositions(chunk['position'].to_numpy(), positionNames))
+
+    def concatenate(parts, dtype):
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+    return PlayerTable(names, concatenate(values, np.float64), concatenate(scores, np.float64),
+                       concatenate(positions, np.int64) if positions else None, positionNames)
+
+def loadPlayerTable(source, sep = ',', positionNames = (), binaryCache = True):
+    """
+        readPlayerTable with the whole file, tables read from a path are cached per process.
+        With binaryCache the roster is memory mapped from its binary cache, which is
+        written next to the CSV. If that directory is not writable the CSV is parsed.
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        return readPlayerTable(source, sep = sep, positionNames = positionNames)
+    key = (os.path.abspath(source), sep, tuple(positionNames))
+    table = _loadedTables.get(key)
+    if table is None:
+        table = None
+        if binaryCache:
+            from player_selector.envs.roster_cache import openRosterCache
+            try:
+                table = openRosterCache(source, sep = sep, positionNames = positionNames)
+            except OSError:
+                table = None
+        if table is None:
+            table = readPlayerTable(source, sep = sep, positionNames = positionNames)
+        _loadedTables[key] = table
+    return table
+
+SHARED_COLUMNS = ('values', 'scores', 'positions', 'available')
+
+def sharePlayerTable(table):
+    """
+        Copy the table columns into shared memory blocks.
+        Returns a small picklable spec for attachPlayerTable and the blocks,
+        the caller owns the blocks and has to close and unlink them.
+    """
+    blocks = []
+    columns = {}
+    sharedColumns = SHARED_COLUMNS + (('scoreSamples',) if table.scoreSamples is not None else ())
+    for column in sharedColumns:
+        array = getattr(table, column)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        columns[column] = (block.name, array.dtype.str, array.shape)
+    spec = {
+        'names': list(table.names),
+        'positionNames': table.positionNames,
+        'sampleShape': table.sampleShape,
+        'columns': columns,
+    }
+    return spec, blocks
+
+def attachPlayerTable(spec):
+    """
+        Build a PlayerTable on top of the shared memory blocks of sharePlayerTable.
+        The blocks are kept on the table so they stay mapped as long as it lives.
+    """
+    blocks = []
+    arrays = {}
+    for column, (name, dtype, shape) in spec['columns'].items():
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        arrays[column] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    scoreSamples = arrays.get('scoreSamples')
+    if scoreSamples is not None:
+        scoreSamples = scoreSamples.reshape((len(scoreSamples),) + tuple(spec['sampleShape']))
+    table = PlayerTable(spec['names'], arrays['values'], arrays['scores'],
+                        arrays['positions'], spec['positionNames'], scoreSamples, arrays['available'])
+    table.sharedBlocks = blocks
+    return table
+
+class SelectedPlayers(object):
+    """
+        Names of the selected players in pick order.
+        Only the player indices are stored, names are looked up in the
+        PlayerTable when the object is actually read.
+    """
+
+    def __init__(self, players, ids):
+        self.players = players
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def size(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        names = self.players.names
+        return (names[i] for i in self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        return self.players.names[self.ids[index]]
+
+    def __contains__(self, playerName):
+        return playerName in list(self)
+
+    def __array__(self, dtype = None, copy = None):
+        return np.array(list(self), dtype = dtype)
+
+    def __repr__(self):
+        return "SelectedPlayers({})".format(list(self))
@@ -1,11 +1,14 @@
 import sys
 import gym
-from gym import spaces, utils
-from gym.utils import seeding
-from six import StringIO
-from contextlib import closing
+from gym import spaces
 import numpy as np
-import pandas as pd
+
+from player_selector.envs.action_mask import ActionMask
+from player_selector.envs.observation import ObservationBuffer
+from player_selector.envs.player_table import PlayerTable, loadPlayerTable, SelectedPlayers
+from player_selector.envs.rendering import SquadRenderer, renderSquad
+from player_selector.envs.rng import makeGenerator
+from player_selector.envs.scenario_scoring import ScenarioScoring
 
 """
     Version 2 of Player selector, using real players this time.
@@ -23,6 +26,8 @@ import pandas as pd
         2	Current Score                       0               3000
         
         We don't care about assigning state to minus budget as it is a fail state
+        Observations are float32, normalize divides them by Max, see observation.ObservationBuffer
+        for the zeroCopy mode.
         
     Actions: 
         Type: Discrete(73)
@@ -31,50 +36,95 @@ import pandas as pd
     Episode Termination:
         Agent selects 11 players
         We are over budget
+        No player is left that fits the budget (dead end)
         Episode length is greater than 200
         
     Rewards:
         By selecting a player we reward agent as much as players score
-        If agent selects the same player again we punish with -300
+        If agent selects the same player again or an unavailable one we punish with -300
         If we gone over budget then we punish with -500
+        A dead end is punished like going over budget with -500
         If agent successfully selects 11 different players, we reward with +500
         
+    Scenario rewards:
+        With rewardMode ('mean', 'quantile' or 'worst') the roster needs score samples over
+        matchdays and scenarios, see PlayerTable.withScoreSamples. Picks are then rewarded with
+        the change of the squad score of that mode instead of the player score, and the
+        observed score is the squad score so far. See scenario_scoring.ScenarioScoring.
+        
+    Curriculum:
+        budget is the starting budget, configure(budget) changes it from the next reset() on.
+        
+    Info:
+        info['action_mask'] is False for players already selected or over the current budget
+        info['squadScore'] at the end of an episode with rewardMode, the squad score computed
+        from the selection mask
+        info['deadEnd'] is True when the episode ended because the action mask was empty
+        
     Players data shape:
         		index, name, value, score
         
+        The CSV is loaded once per process into a shared PlayerTable.
+        players can be a PlayerTable, a path or a file object.
+        PlayerTable.update() changes of values, scores and availability are picked up
+        by a live env, its action mask is rebuilt for the current squad.
+        
 """
 NUMBER_PLAYERS_TO_SELECT = 11
 INITIAL_BUDGET = 1500   
 MAX_IMPOSSIBLE_SCORE = 3000
+PLAYERS_FILE = 'playerselector2_players.csv'
 
 class PlayerSelector2Env(gym.Env):  
-    metadata = {'render.modes': ['human', 'ansi']}
+    metadata = {'render.modes': ['human', 'ansi', 'log']}
+    PROFILE_PHASES = {
+        'step': 'step',
+        'step.lookup': 'mapPlayers',
+        'step.duplicateCheck': 'isPlayerAlreadySelected',
+        'step.observation': 'observe',
+        'step.actionMask': 'validActions.pick',
+        'step.info': 'stepInfo',
+        'reset': 'reset',
+    }
     
-    def readPlayerData(self):
-        my_data = pd.read_csv('playerselector2_players.csv')
-        return my_data
+    def readPlayerData(self, path = PLAYERS_FILE):
+        return loadPlayerTable(path)
     
-    def __init__(self):
-        self.players = self.readPlayerData()
+    def __init__(self, players = None, normalize = False, zeroCopy = False, rewardMode = None,
+                 quantile = 0.1, budget = INITIAL_BUDGET):
+        if not isinstance(players, PlayerTable):
+            players = self.readPlayerData(PLAYERS_FILE if players is None else players)
+        self.players = players
         self.nA = len(self.players)
-        self.selectedPlayers = np.array([])
+        self.squadSize = NUMBER_PLAYERS_TO_SELECT
+        self.initialBudget = budget
+        self.pendingBudget = None
+        self.selectedMask = np.zeros(self.nA, dtype=bool)
+        self.selectedIds = []
+        self.validActions = ActionMask(self.players.values, self.players.valueIndex(), self.players.available)
+        self.validActions.reset(self.initialBudget)
+        self.players.subscribe(self.onRosterUpdate)
+        self.scoring = None if rewardMode is None else ScenarioScoring(self.players, rewardMode, quantile)
+        self.renderer = SquadRenderer(("#", "Player", "Value", "Score"), "{:>2}  {:<24} {:>8} {:>8}")
         
         high = np.array([
-                NUMBER_PLAYERS_TO_SELECT,
-                INITIAL_BUDGET,
+                self.squadSize,
+                self.initialBudget,
                 MAX_IMPOSSIBLE_SCORE
                 ])
+        self.observationBuffer = ObservationBuffer(high, normalize, zeroCopy)
 
         self.action_space = spaces.Discrete(self.nA)
-        self.observation_space = spaces.Box(-high, high, dtype=np.float32)
+        self.observation_space = self.observationBuffer.space
 
         self.seed()
-        self.state = (0,INITIAL_BUDGET,0)
+        self.state = (0,self.initialBudget,0)
+        self.observationBuffer.write(self.state)
         self.lastaction=None
         pass
 
     def seed(self, seed=None):
-        self.np_random, seed = seeding.np_random(seed)
+        self.np_random, seed = makeGenerator(seed)
         return [seed]
     
     def step(self, action):
@@ -83,44 +133,101 @@ class PlayerSelector2Env(gym.Env):
         done = False
         
         playerName, playerValue, playerScore  = self.mapPlayers(action)
-        playerAlreadySelected = self.isPlayerAlreadySelected(playerName)
+        playerAlreadySelected = self.isPlayerAlreadySelected(action)
         
-        if playerAlreadySelected:
+        if playerAlreadySelected or not self.players.available[action]:
             reward = -300
             self.lastaction = action
-            return np.array(self.state), reward, done, {}
+            return self.observe(), reward, done, self.stepInfo()
         else:
-            reward = playerScore
-            self.selectedPlayers = np.append(self.selectedPlayers, playerName)
+            self.selectedMask[action] = True
+            self.selectedIds.append(action)
         
-        newPlayerCount = self.selectedPlayers.size
+        newPlayerCount = len(self.selectedIds)
         newBudget = currentBudget - playerValue
-        newScore = currentScore + playerScore
+        if self.scoring is None:
+            reward = playerScore
+            newScore = currentScore + playerScore
+        else:
+            self.scoring.pick(action)
+            newScore = self.scoring.score()
+            reward = newScore - currentScore
+        
+        self.validActions.pick(action, newBudget)
         
         # Check done states
+        deadEnd = False
         if newBudget < 0:
             done = True
             reward = -500
-        elif newPlayerCount == NUMBER_PLAYERS_TO_SELECT:
+        elif newPlayerCount == self.squadSize:
             done = True
             reward = 500
+        elif not self.validActions.any():
+            done = deadEnd = True
+            reward = -500
             
         self.state = (newPlayerCount, newBudget, newScore)
+        self.observationBuffer.write(self.state)
         self.lastaction = action
-        return np.array(self.state), reward, done, {}
+        info = self.stepInfo()
+        if deadEnd:
+            info['deadEnd'] = True
+        if done and self.scoring is not None:
+            info['squadScore'] = self.squadScore()
+        return self.observe(), reward, done, info
     
     def mapPlayers(self, playerId):
-        return self.players.iloc[playerId,:]
+        players = self.players
+        return players.names[playerId], players.values[playerId], players.scores[playerId]
         
-    def isPlayerAlreadySelected(self, playerName):
-        if playerName in self.selectedPlayers:
-            return True
-        else:
-            return False
+    @property
+    def selectedPlayers(self):
+        return np.array(SelectedPlayers(self.players, self.selectedIds))
+
+    def observe(self):
+        return self.observationBuffer.read()
+
+    def actionMask(self):
+        return self.validActions.view()
+
+    def stepInfo(self):
+        return {'action_mask': self.actionMask()}
+
+    def configure(self, budget = None):
+        """
+            Budget of the episodes from the next reset() on.
+        """
+        if budget is not None:
+            self.pendingBudget = budget
+
+    def onRosterUpdate(self, playerIds):
+        validActions = self.validActions
+        validActions.available = self.players.available
+        validActions.reset(self.state[1])
+        validActions.closePlayers(self.selectedIds)
+
+    def squadScore(self):
+        return float(self.scoring.evaluate(self.selectedMask))
+
+    def isPlayerAlreadySelected(self, playerId):
+        return self.selectedMask[playerId]
     
-    def reset(self):
-        self.seed()
-        self.selectedPlayers = np.array([])
-        self.state = (0,INITIAL_BUDGET,0)
+    def reset(self, seed = None):
+        if seed is not None:
+            self.seed(seed)
+        if self.pendingBudget is not None:
+            self.initialBudget, self.pendingBudget = self.pendingBudget, None
+        self.selectedMask[:] = False
+        self.selectedIds = []
+        self.validActions.reset(self.initialBudget)
+        if self.scoring is not None:
+            self.scoring.reset()
+        self.state = (0,self.initialBudget,0)
+        self.observationBuffer.write(self.state)
         self.lastaction = None
-        return self.state
\ No newline at end of file
+        return self.observe()
+
+    def render(self, mode='human', close=False):
+        footer = "Budget {}  Score {}".format(self.state[1], self.state[2])
+        return renderSquad(self.renderer, self.selectedIds, self.mapPlayers, footer, mode, sys.stdout)
\ No newline at end of file
@@ -1,8 +1,17 @@
+import sys
 import gym
 from gym import spaces
-from gym.utils import seeding
 import numpy as np
-import pandas as pd
+
+from player_selector.envs.action_mask import ActionMask
+from player_selector.envs.observation import ObservationBuffer
+from player_selector.envs.formation import (
+        POSITION_GK, POSITION_DF, POSITION_MF, POSITION_ST, POSITIONS, FORMATION_433, getFormation)
+from player_selector.envs.player_table import PlayerTable, loadPlayerTable, SelectedPlayers
+from player_selector.envs.rendering import SquadRenderer, renderSquad
+from player_selector.envs.roster_features import RosterFeatures, NUM_FEATURES
+from player_selector.envs.rng import makeGenerator
+from player_selector.envs.scenario_scoring import ScenarioScoring
 
 """
     Version 3 of Player selector, using all players this time.
@@ -24,6 +33,16 @@ import pandas as pd
         1	Current Budget                     -1500            1500
         2	Current Score                      -10000           10000
         
+        Observations are float32 arrays, normalize divides them by Max, see
+        observation.ObservationBuffer for the zeroCopy mode.
+        
+        observationMode='rich' returns a dict instead:
+            state       the observation above
+            positions   (positions, 3) float32, per position the best score that fits in
+                        the budget, the remaining slots and the minimum value to fill them,
+                        kept up to date per pick, see roster_features.RosterFeatures
+            selected    (417,) int8 selection mask
+        
     Actions: 
         Type: Discrete(417)
         There are 417 discrete actions, selecting from player 0 to 416.
@@ -31,20 +50,74 @@ import pandas as pd
     Episode Termination:
         Agent selects 11 players
         We are over budget
+        No player is left that fits the budget and an open position (dead end)
         Episode length is greater than 200
         
     Rewards:
         By selecting a player we reward agent as much as players score
-        If agent selects the same player again we punish with -300 and ignore this action
-        If agent selects a position that is full we punish with -300 and ignore this action
+        If agent selects the same player again or an unavailable one the reward is 0 and we ignore this action
+        If agent selects a position that is full the reward is 0 and we ignore this action
         If we gone over budget then we punish with -1000
+        A dead end is punished like going over budget with -1000
         If agent successfully selects 11 different players, we reward with +500
         
+    Scenario rewards:
+        With rewardMode ('mean', 'quantile' or 'worst') the roster needs score samples over
+        matchdays and scenarios, see PlayerTable.withScoreSamples. Picks are then rewarded with
+        the change of the squad score of that mode instead of the player score, and the
+        observed score is the squad score so far. See scenario_scoring.ScenarioScoring.
+        
+    Info:
+        info['selectedPlayers'] gives the names of the selected players in pick order,
+        names are only looked up when it is read.
+        info['action_mask'] is a boolean vector over the actions, False for players that are
+        already selected, play a full position or cost more than the current budget.
+        The same mask is returned by actionMask().
+        info['squadScore'] at the end of an episode with rewardMode, the squad score computed
+        from the selection mask.
+        info['deadEnd'] is True when the episode ended because the action mask was empty.
+        
     Players data shape:
         		index, name, position, value, score
+        
+        The CSV is loaded once per process into a shared PlayerTable.
+        players can be a PlayerTable, a path or a file object, see readPlayerTable
+        to stream and filter big rosters.
+        PlayerTable.update() changes of values, scores and availability are picked up
+        by a live env, its action mask and roster features are fixed for the current squad.
                 
+    Formation:
+        The 4-3-3 above is the default, any Formation (or name like "4-4-2") can be
+        passed as formation. The observation then has one count per position and
+        the episode ends when formation.squadSize players are selected.
+        
+    Snapshots:
+        get_state() copies the mutable state into a small fixed size structured array:
+        picks in order, position counts, budget, score, lastaction and RNG state.
+        set_state() restores it, the roster is never copied, so tree search can
+        branch from any state cheaply.
+        
+    Curriculum:
+        budget is the starting budget, configure(budget, formation) changes the budget
+        and/or formation from the next reset() on. The observation space keeps the
+        bounds of the constructor's formation and budget, so start from the loosest.
+        See player_selector.rewards.Curriculum.
+        
+    Seeding:
+        seed() builds the env's Generator once, reset(seed=...) only reseeds when a
+        seed is given. See rng.spawnSeeds to seed many envs from one root seed.
+        
+    Profiling:
+        PROFILE_PHASES lists the timed phases of step and reset, see profiling.EnvProfiler.
+        
+    Render:
+        Table of the selected players by name and position with the budget and score left.
+        'log' only returns the picks since the last 'log' frame, see rendering.TextLog.
+        
     Note:
         Maximum possible score here is probably 2900
+        player_selector.solver.solveOptimalSquad computes the exact best squad and score
+        for a roster and budget.
         
 """
 MAX_PLAYERS = 11
@@ -55,103 +128,316 @@ MAX_ST = 3
 INITIAL_BUDGET = 1500   
 MAX_IMPOSSIBLE_SCORE = 10000
 
-POSITION_GK = "goalkeeper"
-POSITION_DF = "defender"
-POSITION_MF = "midfielder"
-POSITION_ST = "attacker"
+PLAYERS_FILE = 'playerselector3_players.csv'
+UINT64_MASK = (1 << 64) - 1
+
+OBSERVATION_STATE = 'state'
+OBSERVATION_RICH = 'rich'
 
 class PlayerSelector3Env(gym.Env):  
+    metadata = {'render.modes': ['human', 'ansi', 'log']}
+    PROFILE_PHASES = {
+        'step': 'step',
+        'step.duplicateCheck': 'isPlayerAlreadySelected',
+        'step.positionCheck': 'isPositionOverflow',
+        'step.state': 'buildState',
+        'step.observation': 'observe',
+        'step.actionMask': 'validActions.pick',
+        'step.info': 'stepInfo',
+        'reset': 'reset',
+    }
     
-    def readPlayerData(self):
-        my_data = pd.read_csv('playerselector3_players.csv', sep = ';')
-        return my_data
+    def readPlayerData(self, path = PLAYERS_FILE):
+        return loadPlayerTable(path, sep = ';', positionNames = POSITIONS)
     
-    def __init__(self):
-        self.players = self.readPlayerData()
+    def __init__(self, players = None, formation = FORMATION_433, normalize = False, zeroCopy = False,
+                 observationMode = OBSERVATION_STATE, rewardMode = None, quantile = 0.1,
+                 budget = INITIAL_BUDGET):
+        if not isinstance(players, PlayerTable):
+            players = self.readPlayerData(PLAYERS_FILE if players is None else players)
+        self.players = players
         self.nA = len(self.players)
+        self.initialBudget = budget
+        self.pendingConfiguration = {}
+        self.formation = getFormation(formation)
+        self.capacity = self.formation.compile(self.players.positionNames)
+        self.positionCounts = np.zeros(len(self.capacity), dtype=np.int64)
+        self.snapshotDtype = self.buildSnapshotDtype()
         
-        high = np.array([
-                MAX_PLAYERS,
-                MAX_GK,
-                MAX_DF,
-                MAX_MF,
-                MAX_ST,
-                INITIAL_BUDGET,
-                MAX_IMPOSSIBLE_SCORE
-                ])
+        high = np.array([self.formation.squadSize]
+                        + self.capacity[:-1].tolist()
+                        + [self.initialBudget, MAX_IMPOSSIBLE_SCORE])
+        self.observationBuffer = ObservationBuffer(high, normalize, zeroCopy)
+        self.selectedMask = np.zeros(self.nA, dtype=bool)
 
         self.action_space = spaces.Discrete(self.nA)
-        self.observation_space = spaces.Box(-high, high, dtype=np.float32)
+        self.observation_space = self.observationBuffer.space
+        self.rosterFeatures = None
+        if observationMode == OBSERVATION_RICH:
+            self.initRichObservation(normalize, zeroCopy)
+        elif observationMode != OBSERVATION_STATE:
+            raise ValueError("Unknown observation mode {!r}".format(observationMode))
 
         self.seed()
-        self.selectedPlayers = np.array([])
-        self.state = (0, 0, 0, 0, 0,INITIAL_BUDGET,0)
+        self.selectedIds = []
+        self.validActions = ActionMask(self.players.values, self.players.valueIndex(), self.players.available)
+        self.validActions.reset(self.initialBudget)
+        self.players.subscribe(self.onRosterUpdate)
+        self.scoring = None if rewardMode is None else ScenarioScoring(self.players, rewardMode, quantile)
+        self.renderer = SquadRenderer(("#", "Player", "Position", "Value", "Score"),
+                                      "{:>2}  {:<24} {:<10} {:>8} {:>8}")
+        self.state = self.initialState()
+        self.writeObservation()
         self.lastaction = None
         pass
 
+    def buildSnapshotDtype(self):
+        return np.dtype([
+                ('picks', np.int64, (self.formation.squadSize,)),
+                ('numPicks', np.int64),
+                ('positionCounts', np.int64, (len(self.capacity),)),
+                ('budget', np.float64),
+                ('score', np.float64),
+                ('lastaction', np.int64),
+                ('rngState', np.uint64, (2,)),
+                ('rngInc', np.uint64, (2,)),
+                ('rngHasUint32', np.int64),
+                ('rngUinteger', np.uint64),
+                ])
+
+    def configure(self, budget = None, formation = None):
+        """
+            Budget and/or formation of the episodes from the next reset() on.
+        """
+        if budget is not None:
+            self.pendingConfiguration['budget'] = budget
+        if formation is not None:
+            self.pendingConfiguration['formation'] = getFormation(formation)
+
+    def applyConfiguration(self):
+        pending, self.pendingConfiguration = self.pendingConfiguration, {}
+        if 'budget' in pending:
+            self.initialBudget = pending['budget']
+        if 'formation' in pending:
+            self.formation = pending['formation']
+            self.capacity = self.formation.compile(self.players.positionNames)
+            self.snapshotDtype = self.buildSnapshotDtype()
+            if self.rosterFeatures is not None:
+                self.rosterFeatures.capacity = np.asarray(self.capacity[:-1])
+
+    def initRichObservation(self, normalize, zeroCopy):
+        capacity = self.capacity[:-1]
+        self.rosterFeatures = RosterFeatures(self.players, capacity)
+        featureHigh = np.zeros((len(capacity), NUM_FEATURES), dtype=np.float32)
+        featureHigh[:] = [MAX_IMPOSSIBLE_SCORE, 1, self.initialBudget]
+        featureHigh[:, 1] = np.maximum(capacity, 1)
+        self.featureScale = 1.0 / featureHigh if normalize else None
+        if normalize:
+            featureHigh = np.ones_like(featureHigh)
+        self.observation_space = spaces.Dict({
+                'state': self.observationBuffer.space,
+                'positions': spaces.Box(-featureHigh, featureHigh, dtype=np.float32),
+                'selected': spaces.MultiBinary(self.nA),
+                })
+        self.featureView = self.rosterFeatures.features.view()
+        self.featureView.setflags(write=False)
+        self.selectedView = self.selectedMask.view(np.int8)
+        self.selectedView.setflags(write=False)
+
     def seed(self, seed = None):
-        self.np_random, seed = seeding.np_random(seed)
+        # PCG64 instead of gym's MT19937 RandomState, its state is small enough for get_state()
+        self.np_random, seed = makeGenerator(seed)
         return [seed]
     
+    def initialState(self):
+        return (0,) + (0,) * (len(self.capacity) - 1) + (self.initialBudget, 0)
+    
+    def buildState(self, playersCount, budget, score):
+        return (playersCount,) + tuple(self.positionCounts[:-1].tolist()) + (budget, score)
+    
     def step(self, action):
-        playersCount, countGK, countDF, countMF, countST, currentBudget, currentScore = self.state
+        currentBudget, currentScore = self.state[-2:]
         reward = 1
         done = False
         
-        playerName, playerPosition, playerValue, playerScore  = self.mapPlayers(action)
-        playerAlreadySelected = self.isPlayerAlreadySelected(playerName)
+        players = self.players
+        playerPosition = players.positions[action]
+        playerValue = players.values[action]
+        playerScore = players.scores[action]
+        playerAlreadySelected = self.isPlayerAlreadySelected(action)
         
         self.lastaction = action
         
-        if playerAlreadySelected or self.isPositionOverflow(playerPosition):
+        if (playerAlreadySelected or not players.available[action]
+                or self.isPositionOverflow(playerPosition)):
             reward = 0
-            return self.state, reward, done, self.selectedPlayers
+            return self.observe(), reward, done, self.stepInfo()
         else:
-            reward = playerScore
-            self.selectedPlayers = np.append(self.selectedPlayers, playerName)
+            self.selectedMask[action] = True
+            self.selectedIds.append(action)
+            if self.rosterFeatures is not None:
+                self.rosterFeatures.pick(action)
         
-        newPlayerCount = self.selectedPlayers.size
-        newCountGK = countGK+1 if (playerPosition == POSITION_GK) else countGK
-        newCountDF = countDF+1 if (playerPosition == POSITION_DF) else countDF
-        newCountMF = countMF+1 if (playerPosition == POSITION_MF) else countMF
-        newCountST = countST+1 if (playerPosition == POSITION_ST) else countST
+        newPlayerCount = len(self.selectedIds)
+        self.positionCounts[playerPosition] += 1
         newBudget = currentBudget - playerValue
-        newScore = currentScore + playerScore
+        if self.scoring is None:
+            reward = playerScore
+            newScore = currentScore + playerScore
+        else:
+            self.scoring.pick(action)
+            newScore = self.scoring.score()
+            reward = newScore - currentScore
+        
+        self.validActions.pick(action, newBudget)
+        if self.isPositionOverflow(playerPosition):
+            self.validActions.closePlayers(players.positionIds(playerPosition))
         
         # Check done states
+        deadEnd = False
         if newBudget < 0:
             done = True
             reward = -1000
-        elif newPlayerCount == MAX_PLAYERS:
+        elif newPlayerCount == self.formation.squadSize:
             done = True
             reward = 500
+        elif not self.validActions.any():
+            done = deadEnd = True
+            reward = -1000
             
-        self.state = (newPlayerCount, newCountGK, newCountDF, newCountMF, newCountST, newBudget, newScore)
-        return self.state, reward, done, self.selectedPlayers
+        self.state = self.buildState(newPlayerCount, newBudget, newScore)
+        self.writeObservation()
+        info = self.stepInfo()
+        if deadEnd:
+            info['deadEnd'] = True
+        if done and self.scoring is not None:
+            info['squadScore'] = self.squadScore()
+        return self.observe(), reward, done, info
     
+    def writeObservation(self):
+        self.observationBuffer.write(self.state)
+        if self.rosterFeatures is not None:
+            features = self.rosterFeatures.update(self.state[-2], self.positionCounts)
+            if self.featureScale is not None:
+                np.multiply(features, self.featureScale, out=features)
+
+    def observe(self):
+        if self.rosterFeatures is None:
+            return self.observationBuffer.read()
+        if self.observationBuffer.zeroCopy:
+            return {'state': self.observationBuffer.read(), 'positions': self.featureView,
+                    'selected': self.selectedView}
+        return {'state': self.observationBuffer.read(), 'positions': self.featureView.copy(),
+                'selected': self.selectedView.copy()}
+
     def mapPlayers(self, playerId):
-        return self.players.iloc[playerId,:]
+        players = self.players
+        return (players.names[playerId], players.positionName(playerId),
+                players.values[playerId], players.scores[playerId])
         
-    def isPlayerAlreadySelected(self, playerName):
-        if playerName in self.selectedPlayers:
-            return True
-        else:
-            return False
+    @property
+    def selectedPlayers(self):
+        return np.array(self.selectedNames())
+
+    def selectedNames(self):
+        return SelectedPlayers(self.players, tuple(self.selectedIds))
+
+    def actionMask(self):
+        return self.validActions.view()
+
+    def stepInfo(self):
+        return {'selectedPlayers': self.selectedNames(), 'action_mask': self.actionMask()}
+
+    def squadScore(self):
+        return float(self.scoring.evaluate(self.selectedMask))
+
+    def isPlayerAlreadySelected(self, playerId):
+        return self.selectedMask[playerId]
         
     def isPositionOverflow(self, playerPosition):
-        _, countGK, countDF, countMF, countST, _, _ = self.state
-        if playerPosition == POSITION_GK:
-            return countGK == MAX_GK
-        elif playerPosition == POSITION_DF:
-            return countDF == MAX_DF
-        elif playerPosition == POSITION_MF:
-            return countMF == MAX_MF
-        elif playerPosition == POSITION_ST:
-            return countST == MAX_ST
+        # playerPosition is a position code, -1 (unknown position) uses the last unlimited slot
+        return self.positionCounts[playerPosition] >= self.capacity[playerPosition]
     
-    def reset(self):
-        self.seed()
-        self.selectedPlayers = np.array([])
-        self.state = (0, 0, 0, 0, 0,INITIAL_BUDGET,0)
+    def get_state(self):
+        numPicks = len(self.selectedIds)
+        picks = self.selectedIds + [0] * (self.formation.squadSize - numPicks)
+        rng = self.np_random.bit_generator.state
+        state, inc = rng['state']['state'], rng['state']['inc']
+        return np.array((
+                picks,
+                numPicks,
+                self.positionCounts,
+                self.state[-2],
+                self.state[-1],
+                -1 if self.lastaction is None else self.lastaction,
+                (state >> 64, state & UINT64_MASK),
+                (inc >> 64, inc & UINT64_MASK),
+                rng['has_uint32'],
+                rng['uinteger'],
+                ), dtype=self.snapshotDtype)
+
+    def set_state(self, snapshot):
+        (picks, numPicks, positionCounts, budget, score, lastaction,
+                rngState, rngInc, hasUint32, uinteger) = snapshot.item()
+        picks = picks[:numPicks].tolist()
+        stateHigh, stateLow = rngState.tolist()
+        incHigh, incLow = rngInc.tolist()
+        if self.rosterFeatures is not None:
+            for playerId in self.selectedIds:
+                self.rosterFeatures.unpick(playerId)
+            for playerId in picks:
+                self.rosterFeatures.pick(playerId)
+        if self.scoring is not None:
+            self.scoring.setPicks(picks)
+        self.selectedIds = picks
+        self.selectedMask[:] = False
+        self.selectedMask[picks] = True
+        self.positionCounts[:] = positionCounts
+        self.state = self.buildState(len(picks), budget, score)
+        self.writeObservation()
+        self.lastaction = None if lastaction < 0 else lastaction
+        self.np_random.bit_generator.state = {
+                'bit_generator': 'PCG64',
+                'state': {'state': stateHigh << 64 | stateLow, 'inc': incHigh << 64 | incLow},
+                'has_uint32': hasUint32,
+                'uinteger': uinteger,
+                }
+        self.rebuildActionMask()
+
+    def rebuildActionMask(self):
+        validActions = self.validActions
+        validActions.available = self.players.available
+        validActions.reset(self.state[-2])
+        validActions.closePlayers(self.selectedIds)
+        for code in np.flatnonzero(self.positionCounts[:-1] >= self.capacity[:-1]):
+            validActions.closePlayers(self.players.positionIds(code))
+
+    def onRosterUpdate(self, playerIds):
+        self.rebuildActionMask()
+        if self.rosterFeatures is not None:
+            self.rosterFeatures.updatePlayers(playerIds, self.selectedMask)
+            self.writeObservation()
+    
+    def reset(self, seed = None):
+        if seed is not None:
+            self.seed(seed)
+        if self.rosterFeatures is not None:
+            for playerId in self.selectedIds:
+                self.rosterFeatures.unpick(playerId)
+        if self.pendingConfiguration:
+            self.applyConfiguration()
+        self.selectedMask[:] = False
+        self.selectedIds = []
+        self.validActions.reset(self.initialBudget)
+        if self.scoring is not None:
+            self.scoring.reset()
+        self.positionCounts[:] = 0
+        self.state = self.initialState()
+        self.writeObservation()
         self.lastaction = None
-        return self.state
\ No newline at end of file
+        return self.observe()
+
+    def render(self, mode='human', close=False):
+        footer = "Budget {}  Score {}  ({}/{})".format(
+                self.state[-2], self.state[-1], len(self.selectedIds), self.formation.squadSize)
+        return renderSquad(self.renderer, self.selectedIds, self.mapPlayers, footer, mode, sys.stdout)
\ No newline at end of file
@@ -0,0 +1,243 @@
+from gym import spaces
+from gym.vector import VectorEnv
+import numpy as np
+
+from player_selector.envs.player_table import PlayerTable, loadPlayerTable
+from player_selector.envs.formation import POSITIONS, FORMATION_433, getFormation
+from player_selector.envs.playerselector3_env import (
+        INITIAL_BUDGET, MAX_IMPOSSIBLE_SCORE, PLAYERS_FILE)
+from player_selector.envs.rng import makeGenerator
+from player_selector.envs.scenario_scoring import ScenarioScoring
+
+"""
+    Batched version of Player selector 3.
+    Instead of stepping N PlayerSelector3Env instances in a Python loop,
+    all squads live in (num_envs, ...) arrays and are stepped together.
+    The rules are exactly the same as PlayerSelector3Env.
+    The roster arrays are read on every step, PlayerTable.update() changes apply
+    to the next step without any listener.
+
+    State per squad:
+        selected        (num_envs, nA)  bool, selection bitmask
+        positionCounts  (num_envs, P+1) selected players per position of the formation,
+                                        the last column counts players without a known position
+        playersCount    (num_envs,)     selected players
+        budget          (num_envs,)     current budget
+        score           (num_envs,)     current score
+
+    Observation:
+        Type: Box(num_envs, P + 3)
+        Same columns as PlayerSelector3Env, one row per squad.
+
+    Actions:
+        Type: MultiDiscrete([nA] * num_envs)
+        One player index per squad.
+
+    Episode Termination:
+        Same as PlayerSelector3Env, the episode length limit is
+        handled here with maxEpisodeSteps since there is no TimeLimit wrapper.
+        Finished rows are reset automatically, the last observation of the
+        finished episode is returned in info['terminal_observation'] and
+        info['deadEnd'] marks the finished rows that ended in a dead end.
+        
+    Seeding:
+        One Generator for the whole batch, reset(seed=...) reseeds it.
+
+    Curriculum:
+        configure(budget, formation) applies to every squad started after the call,
+        each row keeps the formation of its own episode in rowCapacity.
+
+    Scenario rewards:
+        rewardMode works as in PlayerSelector3Env, the season scores of all squads are
+        a (num_envs, scenarios) array. info['squadScore'] has the scores of
+        the finished squads, one matrix product over their selection masks.
+"""
+MAX_EPISODE_STEPS = 200
+
+class PlayerSelector3VecEnv(VectorEnv):
+
+    def readPlayerData(self, path = PLAYERS_FILE):
+        return loadPlayerTable(path, sep = ';', positionNames = POSITIONS)
+
+    def __init__(self, num_envs, maxEpisodeSteps = MAX_EPISODE_STEPS, players = None, formation = FORMATION_433,
+                 rewardMode = None, quantile = 0.1, budget = INITIAL_BUDGET):
+        if not isinstance(players, PlayerTable):
+            players = self.readPlayerData(PLAYERS_FILE if players is None else players)
+        self.players = players
+        self.nA = len(self.players)
+        self.maxEpisodeSteps = maxEpisodeSteps
+        self.formation = getFormation(formation)
+        # per position code plus the unlimited last entry of players without a known position
+        self.capacity = self.formation.compile(self.players.positionNames)
+        numPositions = len(self.capacity)
+
+        self.initialBudget = budget
+        high = np.array([self.formation.squadSize]
+                        + self.capacity[:-1].tolist()
+                        + [self.initialBudget, MAX_IMPOSSIBLE_SCORE])
+
+        super(PlayerSelector3VecEnv, self).__init__(
+                num_envs,
+                spaces.Box(-high, high, dtype=np.float32),
+                spaces.Discrete(self.nA))
+
+        self.rows = np.arange(num_envs)
+        self.selected = np.zeros((num_envs, self.nA), dtype=bool)
+        self.positionCounts = np.zeros((num_envs, numPositions), dtype=np.int64)
+        self.playersCount = np.zeros(num_envs, dtype=np.int64)
+        self.budget = np.full(num_envs, self.initialBudget, dtype=np.float64)
+        # formation of every row, a configure() only reaches a row when it is reset
+        self.rowCapacity = np.tile(self.capacity, (num_envs, 1))
+        self.rowSquadSize = np.full(num_envs, self.formation.squadSize, dtype=np.int64)
+        self.score = np.zeros(num_envs, dtype=np.float64)
+        self.elapsedSteps = np.zeros(num_envs, dtype=np.int64)
+        self.lastaction = np.full(num_envs, -1, dtype=np.int64)
+        self.observations = np.zeros((num_envs, len(high)), dtype=np.float32)
+        self.initialObservation = np.zeros(len(high), dtype=np.float32)
+        self.initialObservation[-2] = self.initialBudget
+        self.scoring = None
+        if rewardMode is not None:
+            self.scoring = ScenarioScoring(self.players, rewardMode, quantile)
+            self.seasonTotals = np.zeros((num_envs, self.scoring.seasonScores.shape[1]), dtype=np.float64)
+        self._actions = None
+        self.seed()
+
+    def seed(self, seed = None):
+        self.np_random, seed = makeGenerator(seed)
+        return [seed]
+
+    def reset(self, seed = None):
+        if seed is not None:
+            self.seed(seed)
+        return super(PlayerSelector3VecEnv, self).reset()
+
+    def resetRows(self, rows):
+        self.selected[rows] = False
+        self.positionCounts[rows] = 0
+        self.playersCount[rows] = 0
+        self.budget[rows] = self.initialBudget
+        self.rowCapacity[rows] = self.capacity
+        self.rowSquadSize[rows] = self.formation.squadSize
+        self.score[rows] = 0
+        if self.scoring is not None:
+            self.seasonTotals[rows] = 0
+        self.elapsedSteps[rows] = 0
+        self.lastaction[rows] = -1
+
+    def observe(self):
+        obs = self.observations
+        obs[:, 0] = self.playersCount
+        obs[:, 1:-2] = self.positionCounts[:, :-1]
+        obs[:, -2] = self.budget
+        obs[:, -1] = self.score
+        return obs.copy()
+
+    def observeRows(self, rows):
+        obs = np.empty((len(rows), self.observations.shape[1]), dtype=np.float32)
+        obs[:, 0] = self.playersCount[rows]
+        obs[:, 1:-2] = self.positionCounts[rows, :-1]
+        obs[:, -2] = self.budget[rows]
+        obs[:, -1] = self.score[rows]
+        return obs
+
+    def reset_wait(self, **kwargs):
+        self.resetRows(self.rows)
+        return self.observe()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.int64)
+
+    def step_wait(self, **kwargs):
+        actions = self._actions
+        self._actions = None
+        return self.stepRows(self.rows, actions)
+
+    def stepRows(self, rows, actions):
+        """
+            Step only the squads in rows (no duplicates) with one action each,
+            the other rows keep their state. Returns observations, rewards,
+            dones and infos for rows, in the same order.
+        """
+        players = self.players
+        positions = players.positions[actions]
+        playerAlreadySelected = self.selected[rows, actions]
+        positionOverflow = self.positionCounts[rows, positions] >= self.rowCapacity[rows, positions]
+        valid = ~(playerAlreadySelected | positionOverflow) & players.available[actions]
+
+        # Invalid picks are ignored with a reward of 0, like PlayerSelector3Env
+        validRows = rows[valid]
+        validActions = actions[valid]
+        self.selected[validRows, validActions] = True
+        self.positionCounts[validRows, positions[valid]] += 1
+        self.playersCount[validRows] += 1
+        self.budget[validRows] -= players.values[validActions]
+        self.lastaction[rows] = actions
+        self.elapsedSteps[rows] += 1
+
+        if self.scoring is None:
+            self.score[validRows] += players.scores[validActions]
+            rewards = np.where(valid, players.scores[actions], 0.0)
+        else:
+            scoring = self.scoring
+            self.seasonTotals[validRows] += scoring.seasonScores[validActions]
+            newScores = scoring.reduce(self.seasonTotals[validRows])
+            rewards = np.zeros(len(rows), dtype=np.float64)
+            rewards[valid] = newScores - self.score[validRows]
+            self.score[validRows] = newScores
+
+        # Check done states
+        overBudget = valid & (self.budget[rows] < 0)
+        squadComplete = valid & ~overBudget & (self.playersCount[rows] == self.rowSquadSize[rows])
+        deadEnd = valid & ~(overBudget | squadComplete)
+        if deadEnd.any():
+            deadEnd[deadEnd] = ~self.maskRows(rows[deadEnd]).any(axis=1)
+        rewards[overBudget | deadEnd] = -1000
+        rewards[squadComplete] = 500
+        timeLimit = self.elapsedSteps[rows] >= self.maxEpisodeSteps
+        dones = overBudget | squadComplete | deadEnd | timeLimit
+
+        obs = self.observe() if rows is self.rows else self.observeRows(rows)
+        infos = {}
+        if dones.any():
+            doneRows = rows[dones]
+            infos['terminal_observation'] = obs[dones]
+            infos['terminal_rows'] = doneRows
+            infos['TimeLimit.truncated'] = timeLimit[dones] & ~(overBudget | squadComplete | deadEnd)[dones]
+            infos['deadEnd'] = deadEnd[dones]
+            if self.scoring is not None:
+                infos['squadScore'] = self.scoring.evaluate(self.selected[doneRows])
+            self.resetRows(doneRows)
+            obs[dones] = self.initialObservation
+        return obs, rewards, dones, infos
+
+    def actionMasks(self):
+        """
+            (num_envs, nA) valid actions, same rules as PlayerSelector3Env.actionMask.
+        """
+        return self.maskRows(self.rows)
+
+    def maskRows(self, rows):
+        players = self.players
+        positionFull = self.positionCounts[rows] >= self.rowCapacity[rows]
+        return (~self.selected[rows]
+                & players.available
+                & (players.values[None, :] <= self.budget[rows, None])
+                & ~positionFull[:, players.positions])
+
+    def configure(self, budget = None, formation = None):
+        """
+            Budget and/or formation of every episode that starts after the call,
+            running episodes keep theirs.
+        """
+        if budget is not None:
+            self.initialBudget = budget
+            self.initialObservation[-2] = budget
+        if formation is not None:
+            self.formation = getFormation(formation)
+            self.capacity = self.formation.compile(self.players.positionNames)
+
+    def close_extras(self, **kwargs):
+        pass
+
+    def selectedPlayers(self, row):
+        return [self.players.names[i] for i in np.flatnonzero(self.selected[row])]
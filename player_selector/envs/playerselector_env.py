@@ -1,11 +1,13 @@
 import sys
 import gym
-from gym import spaces, utils
-from gym.utils import seeding
-from six import StringIO
-from contextlib import closing
+from gym import spaces
 import numpy as np
 
+from player_selector.envs.action_mask import ActionMask
+from player_selector.envs.observation import ObservationBuffer
+from player_selector.envs.rendering import SquadRenderer, renderSquad
+from player_selector.envs.rng import makeGenerator
+
 """
     Observation: 
         Type: Box(3)
@@ -18,6 +20,9 @@ import numpy as np
         Max 812 for score won't be possible, but just to be sure.
         Min -15 for score because lowest possible players to chose would be 15 + 0 - 30 = -15
         
+        Observations are float32, normalize divides them by Max, see observation.ObservationBuffer
+        for the zeroCopy mode.
+        
     Actions: 
         Type: Discrete(10)
         There are 10 discrete actions, selecting from player 1 to 10.
@@ -33,6 +38,13 @@ import numpy as np
         If we come gone over budget the we punish with -1000
         If agent successfully selects 3 different players, we reward with +500
         
+    Info:
+        info['action_mask'] is False for players already selected or over the current budget
+        
+    Render:
+        Table of the selected players with the budget and score left, 'log' only returns
+        the picks since the last 'log' frame, see rendering.TextLog.
+        
     Players:
         		score	value
         A	0	230	    80
@@ -52,26 +64,42 @@ import numpy as np
 """
 
 class PlayerSelectorEnv(gym.Env):  
-    metadata = {'render.modes': ['human', 'ansi']}
+    metadata = {'render.modes': ['human', 'ansi', 'log']}
+    PROFILE_PHASES = {
+        'step': 'step',
+        'step.lookup': 'mapPlayers',
+        'step.duplicateCheck': 'isPlayerAlreadySelected',
+        'step.observation': 'observe',
+        'step.actionMask': 'validActions.pick',
+        'step.info': 'stepInfo',
+        'reset': 'reset',
+    }
     
-    def __init__(self):
+    def __init__(self, normalize = False, zeroCopy = False):
         self.nS = 1000
         self.isd = np.zeros(self.nS)
         self.nA = 10
-        self.selectedPlayers = np.array([])
+        self.selectedMask = np.zeros(self.nA, dtype=bool)
+        self.selectedIds = []
+        self.playerValues = np.array([self.mapPlayers(playerId)[2] for playerId in range(self.nA)])
+        self.validActions = ActionMask(self.playerValues)
+        self.validActions.reset(115)
+        self.renderer = SquadRenderer(("#", "Player", "Value", "Score"), "{:>2}  {:<6} {:>6} {:>6}")
         
         high = np.array([3,115,1000])
+        self.observationBuffer = ObservationBuffer(high, normalize, zeroCopy)
 
         self.action_space = spaces.Discrete(self.nA)
-        self.observation_space = spaces.Box(-high, high, dtype=np.float32)
+        self.observation_space = self.observationBuffer.space
 
         self.seed()
         self.state = (0,115,0)
+        self.observationBuffer.write(self.state)
         self.lastaction=None
         pass
 
     def seed(self, seed=None):
-        self.np_random, seed = seeding.np_random(seed)
+        self.np_random, seed = makeGenerator(seed)
         return [seed]
     
     def step(self, action):
@@ -80,17 +108,18 @@ class PlayerSelectorEnv(gym.Env):
         done = False
         
         playerName, playerScore, playerValue = self.mapPlayers(action)
-        playerAlreadySelected = self.isPlayerAlreadySelected(playerName)
+        playerAlreadySelected = self.isPlayerAlreadySelected(action)
         
         if playerAlreadySelected:
             reward = -300
             self.lastaction = action
-            return np.array(self.state), reward, done, {}
+            return self.observe(), reward, done, self.stepInfo()
         else:
             reward = playerScore
-            self.selectedPlayers = np.append(self.selectedPlayers, playerName)
+            self.selectedMask[action] = True
+            self.selectedIds.append(action)
         
-        newPlayerCount = self.selectedPlayers.size
+        newPlayerCount = len(self.selectedIds)
         newBudget = currentBudget - playerValue
         newScore = currentScore + playerScore
         
@@ -103,8 +132,10 @@ class PlayerSelectorEnv(gym.Env):
             reward = 500
             
         self.state = (newPlayerCount, newBudget, newScore)
+        self.observationBuffer.write(self.state)
         self.lastaction = action
-        return np.array(self.state), reward, done, {}
+        self.validActions.pick(action, newBudget)
+        return self.observe(), reward, done, self.stepInfo()
     
     def mapPlayers(self, playerId):
         if playerId == 0:
@@ -128,40 +159,37 @@ class PlayerSelectorEnv(gym.Env):
         elif playerId == 9:
             return 'J', -30, 50
         
-    def isPlayerAlreadySelected(self, playerName):
-        if playerName in self.selectedPlayers:
-            return True
-        else:
-            return False
+    @property
+    def selectedPlayers(self):
+        return np.array([self.mapPlayers(playerId)[0] for playerId in self.selectedIds])
+
+    def observe(self):
+        return self.observationBuffer.read()
+
+    def actionMask(self):
+        return self.validActions.view()
+
+    def stepInfo(self):
+        return {'action_mask': self.actionMask()}
+
+    def isPlayerAlreadySelected(self, playerId):
+        return self.selectedMask[playerId]
     
-    def reset(self):
-        self.seed()
-        self.selectedPlayers = np.array([])
-        self.isd = np.zeros(self.nS)
+    def reset(self, seed = None):
+        if seed is not None:
+            self.seed(seed)
+        self.selectedMask[:] = False
+        self.selectedIds = []
+        self.validActions.reset(115)
         self.state = (0,115,0)
+        self.observationBuffer.write(self.state)
         self.lastaction = None
-        return self.state
+        return self.observe()
 
     def render(self, mode='human', close=False):
-        outfile = StringIO() if mode == 'ansi' else sys.stdout
-
-        out = self.desc.copy().tolist()
-        out = [[c.decode('utf-8') for c in line] for line in out]
-        pointer_row, pointer_col, hasPlayer = self.decode(self.s)
-
-        def ul(x): return "_" if x == " " else x
-        
-        out[1 + pointer_row][pointer_col + 1] = utils.colorize(out[1 + pointer_row][pointer_col + 1], 'yellow', highlight=True)
-
-        outfile.write("\n".join(["".join(row) for row in out]) + "\n")
-        if self.lastaction is not None:
-            outfile.write("  ({}),".format(pointer_row))
-            outfile.write("  ({})".format(pointer_col))
-            outfile.write("  ({})\n".format(hasPlayer))
-            outfile.write("  ({})\n".format(["Down", "Up", "Right", "Left", "Player"][self.lastaction]))
-        else: outfile.write("\n")
+        footer = "Budget {}  Score {}".format(self.state[1], self.state[2])
+        return renderSquad(self.renderer, self.selectedIds, self.squadRow, footer, mode, sys.stdout)
 
-        # No need to return anything for human
-        if mode != 'human':
-            with closing(outfile):
-                return outfile.getvalue()
\ No newline at end of file
+    def squadRow(self, playerId):
+        playerName, playerScore, playerValue = self.mapPlayers(playerId)
+        return playerName, playerValue, playerScore
\ No newline at end of file
@@ -0,0 +1,193 @@
+import cProfile
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+"""
+    Optional instrumentation for the player_selector envs.
+
+    Every env class lists its phases in PROFILE_PHASES, phase name to the method
+    that implements it ('validActions.pick' is the pick method of env.validActions).
+    EnvProfiler.enable() puts a timing wrapper on the instance for every phase,
+    disable() removes them again, so a disabled profiler costs nothing, the env
+    runs its plain class methods.
+
+    Phases named 'step.x' run inside 'step' and are only counted while step is
+    running, a call from reset() is not. summary() adds 'step.other' for the time
+    of step spent outside of its listed phases.
+
+    Example:
+        profiler = EnvProfiler(env).enable()
+        ... run episodes ...
+        print(profiler.summary())
+        profiler.stats()['step.duplicateCheck']     {'calls': ..., 'totalNs': ..., 'meanNs': ...}
+
+    SamplingProfiler samples the stack of one thread every interval seconds from
+    a background thread with sys._current_frames, no profile hook is installed,
+    so it can stay on in production. profileCall runs a function under cProfile.
+"""
+
+def resolveMethod(env, path):
+    owner = env
+    parts = path.split('.')
+    for part in parts[:-1]:
+        owner = getattr(owner, part)
+    return owner, parts[-1]
+
+def timedMethod(function, counter, parent = None):
+    """
+        counter is [calls, nanoseconds, running], calls only count while parent is running.
+    """
+    clock = time.perf_counter_ns
+
+    def timed(*args, **kwargs):
+        if parent is not None and not parent[2]:
+            return function(*args, **kwargs)
+        start = clock()
+        counter[2] += 1
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counter[2] -= 1
+            counter[0] += 1
+            counter[1] += clock() - start
+    return timed
+
+class EnvProfiler(object):
+
+    def __init__(self, env, phases = None):
+        self.env = env.unwrapped
+        self.phases = dict(phases if phases is not None else type(self.env).PROFILE_PHASES)
+        # phase -> [calls, nanoseconds, running]
+        self.counters = {phase: [0, 0, 0] for phase in self.phases}
+        self.installed = []
+        self.summaryThread = None
+
+    @property
+    def enabled(self):
+        return bool(self.installed)
+
+    def enable(self):
+        if not self.installed:
+            for phase, path in self.phases.items():
+                owner, name = resolveMethod(self.env, path)
+                parent = self.counters.get(phase.rpartition('.')[0])
+                setattr(owner, name, timedMethod(getattr(owner, name), self.counters[phase], parent))
+                self.installed.append((owner, name))
+        return self
+
+    def disable(self):
+        for owner, name in reversed(self.installed):
+            delattr(owner, name)
+        self.installed = []
+        return self
+
+    def reset(self):
+        for counter in self.counters.values():
+            counter[0] = counter[1] = 0
+
+    def stats(self):
+        stats = {}
+        for phase, (calls, ns, _) in self.counters.items():
+            stats[phase] = {'calls': calls, 'totalNs': ns, 'meanNs': ns / calls if calls else 0.0}
+        for parent in set(phase.split('.')[0] for phase in self.counters if '.' in phase):
+            if parent in self.counters:
+                calls, ns, _ = self.counters[parent]
+                inner = sum(n for phase, (_, n, _) in self.counters.items() if phase.startswith(parent + '.'))
+                stats[parent + '.other'] = {'calls': calls, 'totalNs': ns - inner,
+                                            'meanNs': (ns - inner) / calls if calls else 0.0}
+        return stats
+
+    def summary(self):
+        stats = self.stats()
+        lines = ["{:<24} {:>10} {:>14} {:>10}".format("phase", "calls", "total ms", "mean us")]
+        for phase in sorted(stats):
+            phaseStats = stats[phase]
+            lines.append("{:<24} {:>10} {:>14.3f} {:>10.3f}".format(
+                    phase, phaseStats['calls'], phaseStats['totalNs'] / 1e6, phaseStats['meanNs'] / 1e3))
+        return "\n".join(lines)
+
+    def startSummary(self, interval = 10.0, outfile = None):
+        """
+            Write summary() to outfile (stderr) every interval seconds until stopSummary().
+        """
+        self.stopSummary()
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                (outfile or sys.stderr).write(self.summary() + "\n")
+        thread = threading.Thread(target=run, name='EnvProfilerSummary', daemon=True)
+        thread.start()
+        self.summaryThread = (thread, stop)
+
+    def stopSummary(self):
+        if self.summaryThread is not None:
+            thread, stop = self.summaryThread
+            stop.set()
+            thread.join()
+            self.summaryThread = None
+
+class SamplingProfiler(object):
+
+    def __init__(self, interval = 0.001, threadId = None, depth = 4):
+        """
+            Samples threadId (the creating thread), counting the innermost depth frames.
+            A sample is only taken when the sampled thread lets go of the GIL, NumPy
+            calls that release it are over represented, the outer frames show who called them.
+        """
+        self.interval = interval
+        self.threadId = threadId if threadId is not None else threading.get_ident()
+        self.depth = depth
+        self.samples = Counter()
+        self.numSamples = 0
+        self.thread = None
+        self.stopEvent = threading.Event()
+
+    def start(self):
+        self.stopEvent.clear()
+        self.thread = threading.Thread(target=self.run, name='SamplingProfiler', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopEvent.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        return self
+
+    def run(self):
+        while not self.stopEvent.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.depth:
+                code = frame.f_code
+                stack.append("{}:{}({})".format(code.co_filename, frame.f_lineno, code.co_name))
+                frame = frame.f_back
+            self.samples[tuple(stack)] += 1
+            self.numSamples += 1
+
+    def top(self, n = 20):
+        """
+            The n most sampled stacks with their share of the samples.
+        """
+        return [(stack, count / self.numSamples) for stack, count in self.samples.most_common(n)]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+def profileCall(function, *args, **kwargs):
+    """
+        Run function under cProfile, returns its result and the pstats.Stats.
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    return result, pstats.Stats(profiler)
@@ -0,0 +1,185 @@
+import numpy as np
+from gym import utils
+
+"""
+    Renderers that keep their last frame and only redo what changed.
+
+    BoardRenderer   TeamCreatorEnv map. The frame is a grid of cell strings, a step
+                    rewrites the cells whose board code or pointer highlight changed.
+                    On a terminal only those cells are redrawn in place with cursor
+                    escape codes, anywhere else the cached frame text is written.
+    SquadRenderer   Table of the selected players for the selector envs. A line is
+                    formatted once when the pick happens and dropped when the squad
+                    gets shorter again (reset, set_state).
+    TextLog         Many episodes in one text file. Frames are queued as the cached
+                    strings and joined once per flush, see the 'log' render mode.
+
+    Example:
+        with TextLog('rollouts.log') as log:
+            for episode in range(1000):
+                log.beginEpisode()
+                env.reset()
+                ...
+                log.record(env)
+"""
+POINTER_COLOR = 'yellow'
+
+class BoardRenderer(object):
+
+    def __init__(self, desc, board, numColumns, cellChars):
+        """
+            desc is the bordered map and board its flat cell codes,
+            board cell i is desc[1 + i // numColumns, 1 + i % numColumns].
+            cellChars maps the board codes to characters.
+        """
+        self.grid = [[c.decode('utf-8') for c in line] for line in np.asarray(desc).tolist()]
+        self.numColumns = numColumns
+        self.cellChars = list(cellChars)
+        self.board = np.array(board)
+        self.pointer = None
+        self.text = None
+        self.dirty = set()
+        self.drawnLines = 0
+
+    def cellPosition(self, cell):
+        row, col = divmod(int(cell), self.numColumns)
+        return row + 1, col + 1
+
+    def update(self, board, pointer):
+        changed = np.flatnonzero(board != self.board).tolist()
+        if pointer != self.pointer:
+            if self.pointer is not None:
+                changed.append(self.pointer)
+            changed.append(pointer)
+        self.board[:] = board
+        self.pointer = pointer
+        for cell in changed:
+            row, col = self.cellPosition(cell)
+            char = self.cellChars[self.board[cell]]
+            if cell == pointer:
+                char = utils.colorize(char, POINTER_COLOR, highlight=True)
+            self.grid[row][col] = char
+            self.dirty.add((row, col))
+        if changed:
+            self.text = None
+
+    def frame(self):
+        if self.text is None:
+            self.text = "\n".join(["".join(line) for line in self.grid]) + "\n"
+        return self.text
+
+    def draw(self, outfile, status):
+        """
+            Write the frame and status lines, in place over the previous frame on a terminal.
+        """
+        isTerminal = getattr(outfile, 'isatty', lambda: False)()
+        if not isTerminal or self.drawnLines == 0:
+            outfile.write(self.frame() + status)
+        else:
+            # Back to the top of the last frame, then jump from changed cell to changed cell
+            out = ["\x1b[{}F".format(self.drawnLines)]
+            currentRow = 0
+            for row, col in sorted(self.dirty):
+                if row > currentRow:
+                    out.append("\x1b[{}E".format(row - currentRow))
+                    currentRow = row
+                out.append("\x1b[{}G{}".format(col + 1, self.grid[row][col]))
+            out.append("\x1b[{}E\x1b[J".format(len(self.grid) - currentRow))
+            out.append(status)
+            outfile.write("".join(out))
+        outfile.flush()
+        self.dirty.clear()
+        self.drawnLines = len(self.grid) + status.count("\n") if isTerminal else 0
+
+class SquadRenderer(object):
+
+    def __init__(self, headers, rowFormat):
+        """
+            rowFormat formats the pick number followed by the fields of one player.
+        """
+        self.rowFormat = rowFormat
+        self.header = rowFormat.format(*headers) + "\n"
+        self.playerIds = []
+        self.lines = []
+        self.logged = 0
+        self.text = None
+
+    def update(self, playerIds, playerRow):
+        common = 0
+        limit = min(len(playerIds), len(self.playerIds))
+        while common < limit and self.playerIds[common] == playerIds[common]:
+            common += 1
+        if common < len(self.playerIds):
+            del self.playerIds[common:]
+            del self.lines[common:]
+            self.logged = min(self.logged, common)
+            self.text = None
+        for playerId in playerIds[common:]:
+            self.playerIds.append(playerId)
+            self.lines.append(self.rowFormat.format(len(self.lines) + 1, *playerRow(playerId)) + "\n")
+            self.text = None
+
+    def frame(self, footer):
+        if self.text is None:
+            self.text = self.header + "".join(self.lines)
+        return self.text + footer + "\n"
+
+    def logText(self, footer):
+        """
+            Lines picked since the last call followed by footer, or "" when nothing was picked.
+        """
+        if self.logged == len(self.lines):
+            return ""
+        text = "".join(self.lines[self.logged:]) + footer + "\n"
+        self.logged = len(self.lines)
+        return text
+
+def renderSquad(renderer, playerIds, playerRow, footer, mode, outfile):
+    renderer.update(playerIds, playerRow)
+    if mode == 'log':
+        return renderer.logText(footer)
+    frame = renderer.frame(footer)
+    if mode == 'ansi':
+        return frame
+    outfile.write(frame)
+
+class TextLog(object):
+
+    def __init__(self, path, flushSize = 1 << 20):
+        self.file = open(path, 'w')
+        self.flushSize = flushSize
+        self.pending = []
+        self.pendingSize = 0
+        self.episodes = 0
+
+    def write(self, text):
+        if text:
+            self.pending.append(text)
+            self.pendingSize += len(text)
+            if self.pendingSize >= self.flushSize:
+                self.flush()
+
+    def beginEpisode(self, label = None):
+        self.episodes += 1
+        self.write("=== episode {} ===\n".format(self.episodes if label is None else label))
+
+    def record(self, env):
+        self.write(env.render(mode='log'))
+
+    def flush(self):
+        if self.pending:
+            self.file.write("".join(self.pending))
+            self.pending = []
+            self.pendingSize = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
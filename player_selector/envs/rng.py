@@ -0,0 +1,29 @@
+import numpy as np
+
+"""
+    Seeding for the player_selector envs.
+
+    Every env owns one np.random.Generator (PCG64), created by seed() and kept
+    across episodes. reset(seed=...) reseeds only when a seed is given, so a run
+    seeded once is reproducible and a reset costs no OS entropy.
+
+    For many envs, one root seed is split with SeedSequence.spawn, children are
+    statistically independent and seed() accepts them directly:
+
+        for env, seedSequence in zip(envs, spawnSeeds(1234, len(envs))):
+            env.seed(seedSequence)
+"""
+
+def makeGenerator(seed = None):
+    """
+        Generator for seed (None, int or SeedSequence) and the entropy it was built from.
+    """
+    seedSequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return np.random.Generator(np.random.PCG64(seedSequence)), seedSequence.entropy
+
+def spawnSeeds(seed, count):
+    """
+        count independent child SeedSequences of seed.
+    """
+    seedSequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return seedSequence.spawn(count)
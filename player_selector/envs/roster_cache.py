@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Sequence
+import numpy as np
+
+from player_selector.envs.player_table import PlayerTable, readPlayerTable
+
+"""
+    Binary roster format, a directory with fixed width NumPy columns that are
+    opened with np.memmap, so building a PlayerTable is near instant and the
+    pages are shared by every process that opens the same roster.
+
+    Files:
+        values.npy      float64 player values
+        scores.npy      float64 player scores
+        positions.npy   int64 position codes
+        names.bin       UTF-8 names back to back
+        nameOffsets.npy int64, name i is names.bin[offsets[i]:offsets[i + 1]]
+        meta.json       format version, source CSV size, mtime and sha256, sep, positionNames
+
+    openRosterCache converts a CSV once and reuses the binary roster while the
+    CSV is unchanged. A changed mtime alone only triggers a hash check, the
+    roster is rebuilt when the content hash differs.
+"""
+FORMAT_VERSION = 1
+CACHE_SUFFIX = '.roster'
+COLUMNS = ('values', 'scores', 'positions')
+
+class NameTable(Sequence):
+    """
+        Player names decoded from the memory mapped string table on access.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("player index out of range")
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return bytes(self.blob[start:end]).decode('utf-8')
+
+    def __iter__(self):
+        blob = bytes(self.blob)
+        offsets = self.offsets.tolist()
+        return (blob[start:end].decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:]))
+
+def fileHash(path, blockSize = 1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blockSize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def writeRoster(table, directory, meta = None):
+    """
+        Write table to directory in the binary roster format, replacing it atomically.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp = tempfile.mkdtemp(prefix='.roster-', dir=parent)
+    try:
+        for column in COLUMNS:
+            np.save(os.path.join(tmp, column + '.npy'), np.asarray(getattr(table, column)))
+        encoded = [name.encode('utf-8') for name in table.names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=offsets[1:])
+        with open(os.path.join(tmp, 'names.bin'), 'wb') as f:
+            f.write(b''.join(encoded))
+        np.save(os.path.join(tmp, 'nameOffsets.npy'), offsets)
+        meta = dict(meta or {})
+        meta.update({'version': FORMAT_VERSION, 'positionNames': list(table.positionNames)})
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(tmp, directory)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+def readRosterMeta(directory):
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def readRoster(directory):
+    """
+        Open a binary roster as a PlayerTable backed by read only memory maps.
+    """
+    meta = readRosterMeta(directory)
+    arrays = {column: np.load(os.path.join(directory, column + '.npy'), mmap_mode='r')
+              for column in COLUMNS}
+    offsets = np.load(os.path.join(directory, 'nameOffsets.npy'), mmap_mode='r')
+    namesPath = os.path.join(directory, 'names.bin')
+    if os.path.getsize(namesPath) > 0:
+        blob = np.memmap(namesPath, dtype=np.uint8, mode='r')
+    else:
+        blob = np.zeros(0, dtype=np.uint8)
+    return PlayerTable(NameTable(blob, offsets), arrays['values'], arrays['scores'],
+                       arrays['positions'], meta['positionNames'] if meta else ())
+
+def sourceStat(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+def openRosterCache(path, sep = ',', positionNames = (), cacheDir = None):
+    """
+        PlayerTable for the CSV at path, converted to the binary format on first use.
+        The cache lives next to the CSV unless cacheDir is given.
+    """
+    if cacheDir is None:
+        directory = os.path.abspath(path) + CACHE_SUFFIX
+    else:
+        directory = os.path.join(cacheDir, os.path.basename(path) + CACHE_SUFFIX)
+    source = sourceStat(path)
+    expected = {'version': FORMAT_VERSION, 'sep': sep, 'positionNames': list(positionNames)}
+    meta = readRosterMeta(directory)
+
+    if meta is not None and all(meta.get(key) == value for key, value in expected.items()):
+        if meta['source'] == source:
+            return readRoster(directory)
+        digest = fileHash(path)
+        if meta['sha256'] == digest:
+            meta['source'] = source
+            with open(os.path.join(directory, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            return readRoster(directory)
+    else:
+        digest = fileHash(path)
+
+    table = readPlayerTable(path, sep = sep, positionNames = positionNames)
+    writeRoster(table, directory, {'sep': sep, 'source': source, 'sha256': digest})
+    return readRoster(directory)
@@ -0,0 +1,179 @@
+from bisect import bisect_right
+import numpy as np
+
+from player_selector.envs.player_table import NO_POSITION
+
+"""
+    Per position roster features for PlayerSelector3Env, kept up to date per pick.
+
+    Every position has its unselected players in value order, cheapest first, in
+        a max segment tree over the scores, best score among the players that
+        cost at most the budget is a prefix maximum,
+        Fenwick trees over the player count and the values, the cheapest way to
+        fill r slots is the value sum up to the r-th unselected player.
+    A pick or an undone pick updates one leaf of each tree and every query walks
+    one tree path, so both are O(log n) in the number of players of the position.
+    Unavailable players are left out like picked ones. A roster update rebuilds
+    the indexes of the positions of the changed players only.
+
+    Features per position, one row each:
+        0   best score of an unselected player that fits in the budget, 0 when
+            there is none or the position is full
+        1   remaining slots
+        2   minimum value of players filling the remaining slots, when there are
+            not enough players left it is the value of all of them
+"""
+NUM_FEATURES = 3
+
+class PositionIndex(object):
+
+    def __init__(self, values, scores):
+        """
+            values and scores of the players of one position, sorted by value.
+        """
+        self.size = len(values)
+        values = np.asarray(values, dtype=np.float64).tolist()
+        self.values = values
+        scores = np.asarray(scores, dtype=np.float64).tolist()
+        self.scores = scores
+        self.leafOffset = 1
+        while self.leafOffset < max(self.size, 1):
+            self.leafOffset *= 2
+        self.maxTree = [-np.inf] * (2 * self.leafOffset)
+        self.maxTree[self.leafOffset:self.leafOffset + self.size] = scores
+        for node in range(self.leafOffset - 1, 0, -1):
+            self.maxTree[node] = max(self.maxTree[2 * node], self.maxTree[2 * node + 1])
+        # Fenwick trees, 1 based
+        self.countTree = [0] * (self.size + 1)
+        self.valueTree = [0.0] * (self.size + 1)
+        for rank in range(self.size):
+            self.addFenwick(rank, 1, values[rank])
+        self.topBit = 1 << max(self.size.bit_length() - 1, 0)
+
+    def addFenwick(self, rank, count, value):
+        i = rank + 1
+        countTree, valueTree = self.countTree, self.valueTree
+        while i <= self.size:
+            countTree[i] += count
+            valueTree[i] += value
+            i += i & -i
+
+    def setScore(self, rank, score):
+        tree = self.maxTree
+        node = self.leafOffset + rank
+        tree[node] = score
+        node //= 2
+        while node:
+            best = max(tree[2 * node], tree[2 * node + 1])
+            if tree[node] == best:
+                break
+            tree[node] = best
+            node //= 2
+
+    def remove(self, rank):
+        self.setScore(rank, -np.inf)
+        self.addFenwick(rank, -1, -self.values[rank])
+
+    def restore(self, rank):
+        self.setScore(rank, self.scores[rank])
+        self.addFenwick(rank, 1, self.values[rank])
+
+    def bestScore(self, budget):
+        """
+            Highest score of the unselected players with value <= budget, -inf when none.
+        """
+        end = bisect_right(self.values, budget)
+        tree = self.maxTree
+        best = -np.inf
+        left, right = self.leafOffset, self.leafOffset + end
+        while left < right:
+            if left & 1:
+                if tree[left] > best:
+                    best = tree[left]
+                left += 1
+            if right & 1:
+                right -= 1
+                if tree[right] > best:
+                    best = tree[right]
+            left >>= 1
+            right >>= 1
+        return best
+
+    def fillCost(self, slots):
+        """
+            Value sum of the slots cheapest unselected players, or of all of them.
+        """
+        if slots <= 0:
+            return 0.0
+        countTree, valueTree = self.countTree, self.valueTree
+        position, total = 0, 0.0
+        remaining = slots
+        step = self.topBit
+        # Largest prefix with fewer than slots players, the next one is the last needed
+        while step:
+            nxt = position + step
+            if nxt <= self.size and countTree[nxt] < remaining:
+                position = nxt
+                remaining -= countTree[nxt]
+                total += valueTree[nxt]
+            step //= 2
+        if position < self.size:
+            total += self.values[position]
+        return total
+
+class RosterFeatures(object):
+
+    def __init__(self, players, capacity):
+        """
+            capacity has the slots per position code, as Formation.capacities.
+        """
+        self.players = players
+        self.capacity = np.asarray(capacity)
+        self.positions = np.asarray(players.positions)
+        self.rankOf = np.full(len(self.positions), -1, dtype=np.int64)
+        self.indexes = [self.buildIndex(code) for code in range(len(self.capacity))]
+        self.features = np.zeros((len(self.capacity), NUM_FEATURES), dtype=np.float32)
+
+    def buildIndex(self, code, selectedMask = None):
+        """
+            Index of the players of position code with the current roster values,
+            without the unavailable and selected players.
+        """
+        players = self.players
+        values = np.asarray(players.values, dtype=np.float64)
+        ids = players.positionIds(code)
+        ids = ids[np.argsort(values[ids], kind='stable')]
+        self.rankOf[ids] = np.arange(len(ids))
+        index = PositionIndex(values[ids], np.asarray(players.scores, dtype=np.float64)[ids])
+        closed = ~np.asarray(players.available)[ids]
+        if selectedMask is not None:
+            closed |= selectedMask[ids]
+        for rank in np.flatnonzero(closed).tolist():
+            index.remove(rank)
+        return index
+
+    def updatePlayers(self, playerIds, selectedMask):
+        codes = np.unique(self.positions[playerIds])
+        for code in codes[codes != NO_POSITION].tolist():
+            self.indexes[code] = self.buildIndex(code, selectedMask)
+
+    def pick(self, playerId):
+        code = self.positions[playerId]
+        # unavailable players are out of the index already
+        if code != NO_POSITION and self.players.available[playerId]:
+            self.indexes[code].remove(self.rankOf[playerId])
+
+    def unpick(self, playerId):
+        code = self.positions[playerId]
+        if code != NO_POSITION and self.players.available[playerId]:
+            self.indexes[code].restore(self.rankOf[playerId])
+
+    def update(self, budget, positionCounts):
+        features = self.features
+        for code, index in enumerate(self.indexes):
+            slots = int(self.capacity[code] - positionCounts[code])
+            best = index.bestScore(budget) if slots > 0 else -np.inf
+            features[code, 0] = best if best != -np.inf else 0.0
+            features[code, 1] = slots
+            features[code, 2] = index.fillCost(slots)
+        return features
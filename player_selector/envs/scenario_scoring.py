@@ -0,0 +1,76 @@
+import numpy as np
+
+"""
+    Squad scores over matchdays and scenarios.
+
+    A PlayerTable can carry scoreSamples, the score of every player on every
+    matchday of every scenario, see PlayerTable.withScoreSamples. The season
+    score of a squad in a scenario is the sum of its players' scores over the
+    matchdays. PlayerTable.seasonScores sums the matchdays once per roster, so
+    the season scores of the squads in selection masks (..., players) are one
+    matrix product:
+
+        seasonScores = masks @ players.seasonScores()      (..., scenarios)
+
+    The reward mode reduces the season scores over the scenarios:
+        'mean'      expected season score
+        'quantile'  the quantile q of the season scores, e.g. q=0.1 for a cautious selector
+        'worst'     lowest season score over the scenarios
+
+    The envs keep the season scores of their squad and add the row of every
+    pick, which is the same product without touching the unselected players.
+"""
+REWARD_MEAN = 'mean'
+REWARD_QUANTILE = 'quantile'
+REWARD_WORST = 'worst'
+REWARD_MODES = (REWARD_MEAN, REWARD_QUANTILE, REWARD_WORST)
+
+class ScenarioScoring(object):
+
+    def __init__(self, players, mode = REWARD_MEAN, quantile = 0.1):
+        if players.scoreSamples is None:
+            raise ValueError("The player table has no score samples, see PlayerTable.withScoreSamples")
+        if mode not in REWARD_MODES:
+            raise ValueError("Unknown reward mode {!r}, expected one of {}".format(mode, REWARD_MODES))
+        if not 0.0 <= quantile <= 1.0:
+            raise ValueError("quantile has to be in [0, 1], got {}".format(quantile))
+        self.seasonScores = players.seasonScores()
+        self.mode = mode
+        self.quantile = quantile
+        self.totals = np.zeros(self.seasonScores.shape[1], dtype=np.float64)
+
+    def reduce(self, seasonScores):
+        """
+            (..., scenarios) season scores to the (...) squad scores of the reward mode.
+        """
+        if self.mode == REWARD_MEAN:
+            return seasonScores.mean(axis=-1)
+        if self.mode == REWARD_WORST:
+            return seasonScores.min(axis=-1)
+        # np.quantile's linear interpolation, partitioning only the two neighbours is much cheaper
+        position = self.quantile * (seasonScores.shape[-1] - 1)
+        low = int(np.floor(position))
+        high = min(low + 1, seasonScores.shape[-1] - 1)
+        parts = np.partition(seasonScores, (low, high), axis=-1)
+        return parts[..., low] + (position - low) * (parts[..., high] - parts[..., low])
+
+    def evaluate(self, masks):
+        """
+            Squad scores of the selection masks (..., players), one matrix product.
+        """
+        masks = np.asarray(masks)
+        return self.reduce(np.matmul(masks.astype(np.float64), self.seasonScores))
+
+    # Season scores of one squad, updated per pick
+
+    def reset(self):
+        self.totals[:] = 0.0
+
+    def pick(self, playerId):
+        self.totals += self.seasonScores[playerId]
+
+    def setPicks(self, playerIds):
+        self.totals[:] = self.seasonScores[playerIds].sum(axis=0) if len(playerIds) else 0.0
+
+    def score(self):
+        return float(self.reduce(self.totals))
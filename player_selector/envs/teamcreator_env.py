@@ -1,12 +1,11 @@
 import sys
 import gym
-from gym import error, spaces, utils
-from gym.utils import seeding
-from six import StringIO
-from contextlib import closing
-from gym.envs.toy_text import discrete
+from gym import spaces
 import numpy as np
 
+from player_selector.envs.rendering import BoardRenderer
+from player_selector.envs.rng import makeGenerator
+
 MAP = [
     "|=====|",
     "|--   |",
@@ -27,7 +26,63 @@ MAP = [
         - 2: move right 
         - 3: move left 
         - 4: select player
+        
+    Tables:
+        The pointer moves don't depend on the board, so next cell and reward of every
+        (cell, action) are computed once in MOVE_CELL and MOVE_REWARD.
+        A cell is row * 5 + col and a state is cell * 4 + hasPlayer.
+        The board is kept as a flat array of cell codes next to desc.
+        transitionModel() builds the full (nS, nA) next state, reward and done tables
+        for the current board up to the next pick, see player_selector.planning for
+        value and policy iteration. The tables are built once per board and player
+        count and cached for all envs (MODEL_CACHE).
+        
+    Render:
+        The frame is kept by a BoardRenderer, a step only redraws the cells that changed.
+        'log' returns the same text as 'ansi' for a TextLog.
 """
+NUM_ROWS = 4
+NUM_COLUMNS = 5
+NUM_CELLS = NUM_ROWS * NUM_COLUMNS
+MAX_PLAYERS = 11
+ACTION_SELECT = 4
+
+CELL_EMPTY = 0
+CELL_FREE = 1
+CELL_PLAYER = 2
+CELL_CHARS = (" ", "-", "P")
+ACTION_NAMES = ["Down", "Up", "Right", "Left", "Player"]
+
+def buildMoveTables():
+    """
+        Next cell and reward for every cell and action, selecting keeps the cell.
+    """
+    moves = [(1, 0), (-1, 0), (0, 1), (0, -1), (0, 0)]
+    nextCell = np.zeros((NUM_CELLS, len(moves)), dtype=np.int64)
+    reward = np.full((NUM_CELLS, len(moves)), -1, dtype=np.int64)
+    for cell in range(NUM_CELLS):
+        row, col = divmod(cell, NUM_COLUMNS)
+        for action, (dRow, dCol) in enumerate(moves):
+            newRow, newCol = row + dRow, col + dCol
+            if 0 <= newRow < NUM_ROWS and 0 <= newCol < NUM_COLUMNS:
+                nextCell[cell, action] = newRow * NUM_COLUMNS + newCol
+            else:
+                nextCell[cell, action] = cell
+                reward[cell, action] = -10
+    return nextCell, reward
+
+def buildBoard(desc):
+    inner = desc[1:NUM_ROWS + 1, 1:NUM_COLUMNS + 1].ravel()
+    board = np.full(NUM_CELLS, CELL_EMPTY, dtype=np.int8)
+    board[inner == b"-"] = CELL_FREE
+    board[inner == b"P"] = CELL_PLAYER
+    return board
+
+MOVE_CELL, MOVE_REWARD = buildMoveTables()
+INITIAL_BOARD = buildBoard(np.asarray(MAP, dtype='c'))
+# (board bytes, players) -> read only (nextStates, rewards, dones)
+MODEL_CACHE = {}
+
 def categorical_sample(prob_n, np_random):
     """
     Sample from categorical distribution
@@ -35,16 +90,26 @@ def categorical_sample(prob_n, np_random):
     """
     prob_n = np.asarray(prob_n)
     csprob_n = np.cumsum(prob_n)
-    return (csprob_n > np_random.rand()).argmax()
+    return (csprob_n > np_random.random()).argmax()
 
 class TeamCreatorEnv(gym.Env):  
-    metadata = {'render.modes': ['human', 'ansi']}
+    metadata = {'render.modes': ['human', 'ansi', 'log']}
+    PROFILE_PHASES = {
+        'step': 'step',
+        'step.select': 'selectPlayer',
+        'step.move': 'movePointer',
+        'reset': 'reset',
+        'render': 'render',
+        'transitionModel': 'transitionModel',
+    }
     
     def __init__(self):
         num_rows = 4
         num_columns = 5
         
         self.desc = np.asarray(MAP, dtype='c')
+        self.board = INITIAL_BOARD.copy()
+        self.renderer = BoardRenderer(self.desc, self.board, NUM_COLUMNS, CELL_CHARS)
         self.max_row = num_rows - 1
         self.max_col = num_columns - 1
         
@@ -64,74 +129,47 @@ class TeamCreatorEnv(gym.Env):
         pass
     
     def step(self, action):
-        row, col, player = self.decode(self.s)
-        goneOutside = False
-        reward = -1
+        cell, hasPlayer = divmod(self.s, 4)
         done = False
-        hasPlayer = player
-        
-        if action == 0 and row < self.max_row:
-            row = row + 1
-        elif action == 0 and row == self.max_row:
-            row = self.max_row
-            reward = -10
-            goneOutside = True
-        elif action == 1 and row > 0:
-            row = row -1
-        elif action == 1 and row == 0:
-            row = 0
-            reward = -10
-            goneOutside = True
-        elif action == 2 and col < self.max_col:
-            col = col + 1
-        elif action == 2 and col == self.max_col:
-            col = self.max_col
-            reward = -10
-            goneOutside = True
-        elif action == 3 and col > 0:
-            col = col - 1
-        elif action == 3 and col == 0:
-            col = 0
-            reward = -10
-            goneOutside = True
-        elif action == 4 and self.desc[row + 1, col + 1] == b"-":
-            self.desc[row + 1, col + 1] = "P"
-            self.nPlayers+=1
-            reward = 2 * self.nPlayers
-            hasPlayer = 1
-#        elif action == 4 and self.desc[row + 1, col + 1] != b"-":
-#            reward = -10
-            
-#        if action != 4 and goneOutside == False and self.desc[row + 1, col + 1] == b"-":
-#            reward = 0
-#        if action != 4 and goneOutside == False and self.desc[row + 1, col + 1] == b"P":
-#            reward = 0
         
-        if action != 4 and self.desc[row + 1, col + 1] == b"P":
-            hasPlayer = 1
-        elif action != 4 and self.desc[row + 1, col + 1] != b"P":
-            hasPlayer = 0
+        if action == ACTION_SELECT:
+            reward, hasPlayer = self.selectPlayer(cell, hasPlayer)
+        else:
+            reward, cell, hasPlayer = self.movePointer(cell, action)
             
         # Add done state, when we have 11 players we can call it done for now, and reward a big prize of 100
-        if self.nPlayers == 11:
+        if self.nPlayers == MAX_PLAYERS:
             done = True
             reward = 1000
             
-        new_state = self.encode(row, col, hasPlayer)
-        self.s = new_state
+        self.s = int(cell * 4 + hasPlayer)
         self.lastaction = action
         return (self.s, reward, done, {})
 
+    def selectPlayer(self, cell, hasPlayer):
+        if self.board[cell] != CELL_FREE:
+            return -1, hasPlayer
+        self.board[cell] = CELL_PLAYER
+        row, col = divmod(cell, NUM_COLUMNS)
+        self.desc[row + 1, col + 1] = "P"
+        self.nPlayers+=1
+        return 2 * self.nPlayers, 1
+
+    def movePointer(self, cell, action):
+        nextCell = MOVE_CELL[cell, action]
+        return int(MOVE_REWARD[cell, action]), nextCell, int(self.board[nextCell] == CELL_PLAYER)
+
     def seed(self, seed=None):
-        self.np_random, seed = seeding.np_random(seed)
+        self.np_random, seed = makeGenerator(seed)
         return [seed]
     
-    def reset(self):
-        self.seed()
-        self.isd = np.zeros(self.nS)
+    def reset(self, seed = None):
+        if seed is not None:
+            self.seed(seed)
         self.s = categorical_sample(self.isd, self.np_random)
         self.lastaction = None
         self.desc = np.asarray(MAP, dtype='c')
+        self.board[:] = INITIAL_BOARD
         self.nPlayers = 0
         return self.s
     
@@ -154,26 +192,60 @@ class TeamCreatorEnv(gym.Env):
         assert 0 <= i < 5
         return reversed(out)
 
-    def render(self, mode='human', close=False):
-        outfile = StringIO() if mode == 'ansi' else sys.stdout
+    def transitionModel(self):
+        """
+            Dense (nS, nA) tables for the current board and player count:
+            next state, reward and done. The board is not part of the state, so the
+            tables only model the way to the next pick: selecting a free slot ends them
+            with the reward of that pick. Replan after every pick, see
+            player_selector.planning.playEpisode.
+            Unused state numbers are absorbing with reward 0.
+            The tables are cached per board and read only.
+        """
+        key = self.boardKey()
+        model = MODEL_CACHE.get(key)
+        if model is None:
+            model = MODEL_CACHE[key] = self.buildTransitionModel()
+            for table in model:
+                table.setflags(write=False)
+        return model
 
-        out = self.desc.copy().tolist()
-        out = [[c.decode('utf-8') for c in line] for line in out]
-        pointer_row, pointer_col, hasPlayer = self.decode(self.s)
+    def boardKey(self):
+        return (self.board.tobytes(), self.nPlayers)
 
-        def ul(x): return "_" if x == " " else x
-        
-        out[1 + pointer_row][pointer_col + 1] = utils.colorize(out[1 + pointer_row][pointer_col + 1], 'yellow', highlight=True)
-
-        outfile.write("\n".join(["".join(row) for row in out]) + "\n")
-        if self.lastaction is not None:
-            outfile.write("  ({}),".format(pointer_row))
-            outfile.write("  ({})".format(pointer_col))
-            outfile.write("  ({})\n".format(hasPlayer))
-            outfile.write("  ({})\n".format(["Down", "Up", "Right", "Left", "Player"][self.lastaction]))
-        else: outfile.write("\n")
-
-        # No need to return anything for human
-        if mode != 'human':
-            with closing(outfile):
-                return outfile.getvalue()
\ No newline at end of file
+    def buildTransitionModel(self):
+        states = np.arange(self.nS)
+        cells, hasPlayer = np.divmod(states, 4)
+        valid = (cells < NUM_CELLS) & (hasPlayer < 2)
+        cells = np.where(valid, cells, 0)
+
+        nextCell = MOVE_CELL[cells]
+        nextStates = nextCell * 4 + (self.board[nextCell] == CELL_PLAYER)
+        rewards = MOVE_REWARD[cells].astype(np.float64)
+        dones = np.zeros((self.nS, self.nA), dtype=bool)
+
+        free = (self.board[cells] == CELL_FREE) & (hasPlayer == 0)
+        selectReward = 1000 if self.nPlayers + 1 == MAX_PLAYERS else 2 * (self.nPlayers + 1)
+        nextStates[:, ACTION_SELECT] = np.where(free, cells * 4 + 1, states)
+        rewards[:, ACTION_SELECT] = np.where(free, selectReward, -1)
+        dones[:, ACTION_SELECT] = free
+
+        nextStates[~valid] = states[~valid, None]
+        rewards[~valid] = 0
+        dones[~valid] = False
+        return nextStates, rewards, dones
+
+    def render(self, mode='human', close=False):
+        cell, hasPlayer = divmod(self.s, 4)
+        self.renderer.update(self.board, cell)
+        status = self.renderStatus(cell, hasPlayer)
+        if mode == 'ansi' or mode == 'log':
+            return self.renderer.frame() + status
+        self.renderer.draw(sys.stdout, status)
+
+    def renderStatus(self, cell, hasPlayer):
+        if self.lastaction is None:
+            return "\n"
+        pointer_row, pointer_col = divmod(cell, NUM_COLUMNS)
+        return "  ({}),  ({})  ({})\n  ({})\n".format(
+                pointer_row, pointer_col, hasPlayer, ACTION_NAMES[self.lastaction])
\ No newline at end of file
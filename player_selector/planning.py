@@ -0,0 +1,96 @@
+import numpy as np
+
+"""
+    Tabular planning on deterministic (nS, nA) tables, as built by
+    TeamCreatorEnv.transitionModel():
+        nextStates  int array, state reached by action a in state s
+        rewards     float array, reward of action a in state s
+        dones       bool array, True when the transition ends the episode
+
+    Both solvers update all states at once with array operations.
+
+    The TeamCreatorEnv tables end at the next pick since the board is not part
+    of the state, playEpisode solves them again after every pick, the policies
+    are cached per board. Each plan is optimal for its next pick only, so the
+    episode is not: on the toy map value iteration takes 23 steps, policy
+    iteration keeps its current action among equally good ones, goes for other
+    picks and takes 26.
+"""
+# (solver, gamma, board key) -> policy
+_policies = {}
+
+def transitionMatrix(nextStates):
+    """
+        Dense (nS, nA, nS) transition probabilities, like P[s][a] of a DiscreteEnv.
+    """
+    nS, nA = nextStates.shape
+    P = np.zeros((nS, nA, nS))
+    P[np.arange(nS)[:, None], np.arange(nA)[None, :], nextStates] = 1.0
+    return P
+
+def actionValues(V, nextStates, rewards, dones, gamma):
+    return rewards + gamma * np.where(dones, 0.0, V[nextStates])
+
+def valueIteration(nextStates, rewards, dones, gamma = 0.99, tol = 1e-8, maxIterations = 10000):
+    """
+        Returns the optimal state values and a greedy policy.
+    """
+    V = np.zeros(nextStates.shape[0])
+    for _ in range(maxIterations):
+        Q = actionValues(V, nextStates, rewards, dones, gamma)
+        newV = Q.max(axis=1)
+        delta = np.abs(newV - V).max()
+        V = newV
+        if delta < tol:
+            break
+    return V, actionValues(V, nextStates, rewards, dones, gamma).argmax(axis=1)
+
+def policyValues(policy, nextStates, rewards, dones, gamma):
+    """
+        Exact values of a deterministic policy, solving (I - gamma P_pi) V = R_pi.
+    """
+    nS = nextStates.shape[0]
+    states = np.arange(nS)
+    P = np.zeros((nS, nS))
+    notDone = ~dones[states, policy]
+    P[states[notDone], nextStates[states, policy][notDone]] = 1.0
+    return np.linalg.solve(np.eye(nS) - gamma * P, rewards[states, policy])
+
+def policyIteration(nextStates, rewards, dones, gamma = 0.99, maxIterations = 1000):
+    """
+        Returns the optimal state values and policy.
+    """
+    policy = np.zeros(nextStates.shape[0], dtype=np.int64)
+    for _ in range(maxIterations):
+        V = policyValues(policy, nextStates, rewards, dones, gamma)
+        Q = actionValues(V, nextStates, rewards, dones, gamma)
+        newPolicy = Q.argmax(axis=1)
+        # Only switch actions that are strictly better, so ties can't cycle
+        keep = Q[np.arange(len(policy)), policy] >= Q.max(axis=1) - 1e-12
+        newPolicy[keep] = policy[keep]
+        if (newPolicy == policy).all():
+            break
+        policy = newPolicy
+    return V, policy
+
+def playEpisode(env, solver = valueIteration, gamma = 0.99, maxSteps = 200):
+    """
+        Run one episode of env with the policy of solver, solving env.transitionModel()
+        again after every pick. Returns the total reward and the number of steps.
+    """
+    state = env.reset()
+    total = 0
+    picked = True
+    for steps in range(1, maxSteps + 1):
+        if picked:
+            key = (solver, gamma, env.boardKey())
+            policy = _policies.get(key)
+            if policy is None:
+                policy = _policies[key] = solver(*env.transitionModel(), gamma = gamma)[1]
+        nPlayers = env.nPlayers
+        state, reward, done, _ = env.step(int(policy[state]))
+        total += reward
+        picked = env.nPlayers != nPlayers
+        if done:
+            break
+    return total, steps
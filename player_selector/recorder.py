@@ -0,0 +1,205 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import gym
+import numpy as np
+
+from player_selector.rollout import observationSize, flatObservation
+
+"""
+    Transition recorder for offline RL on the player_selector envs.
+
+    TrajectoryRecorder wraps an env and copies every transition into
+    preallocated column buffers of chunkSize rows. A full buffer is written as
+    one compressed chunk-NNNNNN.npz and then reused from row 0, nothing is
+    pickled and player picks are stored as player indices, never names.
+
+    Columns:
+        observations        (n, obsDim)     float32, Dict observations flattened in key order
+        actions             (n,)            int64
+        rewards             (n,)            float64
+        dones               (n,)            bool
+        nextObservations    (n, obsDim)     float32
+        episodes            (n,)            int64, episode number in this directory
+        picks               (n, maxPicks)   int32, selected player ids after the step, -1 padded
+                                            (only for envs with selectedIds)
+
+    TrajectoryReader unpacks the chunks once into one .npy file per column in
+    directory/columns and opens them with np.memmap, so replay sampling only
+    touches the pages of the sampled rows. The columns are rebuilt when chunks
+    were added since the last unpack.
+"""
+CHUNK_PATTERN = 'chunk-{:06d}.npz'
+COLUMNS_DIR = 'columns'
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+def chunkFiles(directory):
+    return sorted(glob.glob(os.path.join(directory, CHUNK_PATTERN.replace('{:06d}', '[0-9]' * 6))))
+
+def picksSize(env):
+    """
+        Largest squad of a selector env, None when the env has no selectedIds.
+    """
+    unwrapped = env.unwrapped
+    if not hasattr(unwrapped, 'selectedIds'):
+        return None
+    formation = getattr(unwrapped, 'formation', None)
+    if formation is not None:
+        return formation.squadSize
+    return unwrapped.squadSize
+
+class TrajectoryRecorder(gym.Wrapper):
+
+    def __init__(self, env, directory, chunkSize = DEFAULT_CHUNK_SIZE):
+        super(TrajectoryRecorder, self).__init__(env)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.chunkSize = chunkSize
+        obsDim = observationSize(env.observation_space)
+        columns = {
+            'observations': ((obsDim,), np.float32),
+            'actions': ((), np.int64),
+            'rewards': ((), np.float64),
+            'dones': ((), np.bool_),
+            'nextObservations': ((obsDim,), np.float32),
+            'episodes': ((), np.int64),
+        }
+        self.maxPicks = picksSize(env)
+        if self.maxPicks is not None:
+            columns['picks'] = ((self.maxPicks,), np.int32)
+        self.buffers = {key: np.zeros((chunkSize,) + shape, dtype=dtype)
+                        for key, (shape, dtype) in columns.items()}
+        self.size = 0
+        # Continue after the chunks of an earlier run in the same directory
+        existing = chunkFiles(directory)
+        self.numChunks = len(existing)
+        self.episode = self.lastEpisode(existing[-1]) + 1 if existing else 0
+        self.lastObservation = None
+
+    @staticmethod
+    def lastEpisode(path):
+        with np.load(path) as chunk:
+            episodes = chunk['episodes']
+            return int(episodes[-1]) if len(episodes) else -1
+
+    def reset(self, **kwargs):
+        if self.lastObservation is not None:
+            self.episode += 1
+        obs = self.env.reset(**kwargs)
+        # zeroCopy envs return the same view every step, keep a copy of this one
+        self.lastObservation = np.array(flatObservation(self.observation_space, obs))
+        return obs
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        row = self.size
+        buffers = self.buffers
+        flat = flatObservation(self.observation_space, obs)
+        buffers['observations'][row] = self.lastObservation
+        buffers['actions'][row] = action
+        buffers['rewards'][row] = reward
+        buffers['dones'][row] = done
+        buffers['nextObservations'][row] = flat
+        buffers['episodes'][row] = self.episode
+        if self.maxPicks is not None:
+            selectedIds = self.env.unwrapped.selectedIds[:self.maxPicks]
+            picks = buffers['picks'][row]
+            picks[:len(selectedIds)] = selectedIds
+            picks[len(selectedIds):] = -1
+        self.lastObservation = np.array(flat)
+        self.size += 1
+        if self.size == self.chunkSize:
+            self.flush()
+        return obs, reward, done, info
+
+    def flush(self):
+        """
+            Write the buffered rows as the next chunk and start over at row 0.
+        """
+        if self.size == 0:
+            return
+        path = os.path.join(self.directory, CHUNK_PATTERN.format(self.numChunks))
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **{key: buffer[:self.size] for key, buffer in self.buffers.items()})
+        os.replace(tmp, path)
+        self.numChunks += 1
+        self.size = 0
+
+    def close(self):
+        self.flush()
+        return self.env.close()
+
+class TrajectoryReader(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.columnsDir = os.path.join(directory, COLUMNS_DIR)
+        chunks = [os.path.basename(path) for path in chunkFiles(directory)]
+        if self.readMeta() != chunks:
+            self.unpack(chunks)
+        self.columns = {}
+        for path in glob.glob(os.path.join(self.columnsDir, '*.npy')):
+            key = os.path.splitext(os.path.basename(path))[0]
+            self.columns[key] = np.load(path, mmap_mode='r')
+        self.size = len(self.columns['actions']) if self.columns else 0
+
+    def readMeta(self):
+        try:
+            with open(os.path.join(self.columnsDir, 'meta.json')) as f:
+                return json.load(f)['chunks']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def unpack(self, chunks):
+        """
+            Concatenate the chunks column by column into .npy files, replacing
+            directory/columns atomically.
+        """
+        tmp = tempfile.mkdtemp(prefix='.columns-', dir=self.directory)
+        try:
+            paths = [os.path.join(self.directory, chunk) for chunk in chunks]
+            if paths:
+                with np.load(paths[0]) as first:
+                    layout = {key: (first[key].shape[1:], first[key].dtype) for key in first.files}
+                lengths = []
+                for path in paths:
+                    with np.load(path) as chunk:
+                        lengths.append(len(chunk['actions']))
+                total = sum(lengths)
+                outputs = {key: np.lib.format.open_memmap(os.path.join(tmp, key + '.npy'), mode='w+',
+                                                          dtype=dtype, shape=(total,) + shape)
+                           for key, (shape, dtype) in layout.items()}
+                start = 0
+                for path, length in zip(paths, lengths):
+                    with np.load(path) as chunk:
+                        for key, output in outputs.items():
+                            output[start:start + length] = chunk[key]
+                    start += length
+                for output in outputs.values():
+                    output.flush()
+                del outputs
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump({'chunks': chunks}, f)
+            if os.path.isdir(self.columnsDir):
+                shutil.rmtree(self.columnsDir)
+            os.replace(tmp, self.columnsDir)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        """
+            Transitions at index (int, slice or index array) as a dict of column arrays.
+        """
+        return {key: column[index] for key, column in self.columns.items()}
+
+    def sample(self, batchSize, np_random = None):
+        np_random = np_random if np_random is not None else np.random.default_rng()
+        # Sorted indices read the memory maps front to back
+        return self[np.sort(np_random.integers(0, self.size, size=batchSize))]
@@ -0,0 +1,323 @@
+from collections import namedtuple
+import inspect
+import gym
+from gym.vector import VectorEnvWrapper
+import numpy as np
+
+from player_selector.recorder import picksSize
+from player_selector.envs.formation import getFormation
+
+"""
+    Configurable rewards and curricula for the roster based selector envs.
+
+    The envs keep their own reward constants (-300 or 0 for a repeated pick,
+    -500 or -1000 for going over budget, +500 for a full squad). The wrappers
+    here replace them with a sum of reward terms computed from the transition,
+    the same way for PlayerSelector2Env, PlayerSelector3Env and
+    PlayerSelector3VecEnv. TeamCreatorEnv has no roster and is not covered.
+
+    Transitions holds a batch of transitions as arrays, a term maps it to one
+    reward per transition, so a whole vector env step or a recorded replay
+    chunk (Transitions.fromObservations) is scored with a few array operations.
+
+    Terms:
+        ScoreReward         score of the picked player / best score of the roster
+        OutcomeReward       the same constants for invalid picks, over budget and full squads
+        BudgetEfficiency    score per value of the picked player, relative to the best
+                            ratio of the roster
+        PotentialShaping    gamma * phi(next) - phi(state), phi is the remaining slots times
+                            the best score affordable with the budget per remaining slot.
+                            Potential based, so the best squads stay the same.
+    Roster derived scales are recomputed when PlayerTable.version changes.
+
+    Curriculum changes the budget and formation by number of env steps through
+    the envs' configure(), new values apply from the next episode on. The wrappers
+    check the stages against their env when they are built, e.g. PlayerSelector2Env
+    has no formation.
+
+    Example:
+        curriculum = Curriculum.linear(budgetStart = 2500, budgetEnd = 1500, numSteps = 10 ** 6,
+                                       formations = [(0, FORMATION_FANTASY_15), (500000, FORMATION_433)])
+        env = ShapedReward(gym.make('PlayerSelector3-v0'), curriculum = curriculum)
+        vec = ShapedVecReward(PlayerSelector3VecEnv(64), curriculum = curriculum)
+"""
+CURRICULUM_SETTINGS = ('budget', 'formation')
+
+Transitions = namedtuple('Transitions', ['counts', 'nextCounts', 'budgets', 'nextBudgets',
+                                         'actions', 'dones', 'squadSizes'])
+
+def fromObservations(observations, actions, nextObservations, dones, squadSize):
+    """
+        Transitions of raw (not normalized) selector observations, count first and
+        budget second to last, e.g. the columns of a TrajectoryReader.
+    """
+    observations = np.asarray(observations)
+    nextObservations = np.asarray(nextObservations)
+    return Transitions(observations[:, 0], nextObservations[:, 0], observations[:, -2], nextObservations[:, -2],
+                       np.asarray(actions), np.asarray(dones, dtype=bool),
+                       np.broadcast_to(squadSize, len(observations)))
+
+Transitions.fromObservations = staticmethod(fromObservations)
+
+def validPicks(transitions):
+    return transitions.nextCounts > transitions.counts
+
+def outcomes(transitions):
+    """
+        Boolean arrays of the valid picks, picks over budget and completed squads.
+    """
+    valid = validPicks(transitions)
+    overBudget = valid & (transitions.nextBudgets < 0)
+    complete = valid & ~overBudget & (transitions.nextCounts >= transitions.squadSizes)
+    return valid, overBudget, complete
+
+class RosterScales(object):
+    """
+        Roster statistics of the reward terms, recomputed after a roster update.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.players = None
+
+    def refresh(self, players):
+        if players is self.players and players.version == self.version:
+            return self
+        scores = np.asarray(players.scores, dtype=np.float64)
+        values = np.asarray(players.values, dtype=np.float64)
+        available = np.asarray(players.available)
+        self.bestScore = max(float(scores[available].max(initial=0.0)), 1e-9)
+        ratios = scores / np.maximum(values, 1e-9)
+        self.bestRatio = max(float(ratios[available].max(initial=0.0)), 1e-9)
+        # best available score per value prefix, for the affordable best score of a budget
+        order, sortedValues = players.valueIndex()
+        self.sortedValues = sortedValues
+        self.bestAffordable = np.maximum.accumulate(np.where(available[order], scores[order], 0.0))
+        self.players = players
+        self.version = players.version
+        return self
+
+    def affordableScores(self, budgets):
+        end = np.searchsorted(self.sortedValues, budgets, side='right')
+        best = np.zeros(len(end), dtype=np.float64)
+        some = end > 0
+        best[some] = self.bestAffordable[end[some] - 1]
+        return np.maximum(best, 0.0)
+
+class ScoreReward(object):
+
+    def __init__(self, weight = 1.0):
+        self.weight = weight
+        self.scales = RosterScales()
+
+    def __call__(self, transitions, players):
+        scales = self.scales.refresh(players)
+        valid, overBudget, _ = outcomes(transitions)
+        scores = np.asarray(players.scores)[transitions.actions] / scales.bestScore
+        return np.where(valid & ~overBudget, self.weight * scores, 0.0)
+
+class OutcomeReward(object):
+
+    def __init__(self, invalid = -0.1, overBudget = -1.0, complete = 1.0):
+        self.invalid = invalid
+        self.overBudget = overBudget
+        self.complete = complete
+
+    def __call__(self, transitions, players):
+        valid, overBudget, complete = outcomes(transitions)
+        rewards = np.where(valid, 0.0, self.invalid)
+        rewards[overBudget] = self.overBudget
+        rewards[complete] += self.complete
+        return rewards
+
+class BudgetEfficiency(object):
+
+    def __init__(self, weight = 0.1):
+        self.weight = weight
+        self.scales = RosterScales()
+
+    def __call__(self, transitions, players):
+        scales = self.scales.refresh(players)
+        valid, overBudget, _ = outcomes(transitions)
+        actions = transitions.actions
+        ratios = np.asarray(players.scores)[actions] / np.maximum(np.asarray(players.values)[actions], 1e-9)
+        return np.where(valid & ~overBudget, self.weight * ratios / scales.bestRatio, 0.0)
+
+class PotentialShaping(object):
+
+    def __init__(self, gamma = 0.99, weight = 1.0):
+        self.gamma = gamma
+        self.weight = weight
+        self.scales = RosterScales()
+
+    def potential(self, counts, budgets, squadSizes):
+        slots = np.maximum(squadSizes - counts, 0)
+        perSlot = np.where(slots > 0, budgets / np.maximum(slots, 1), 0.0)
+        estimate = slots * self.scales.affordableScores(perSlot)
+        return np.where(budgets >= 0, estimate / self.scales.bestScore, 0.0)
+
+    def __call__(self, transitions, players):
+        self.scales.refresh(players)
+        t = transitions
+        potential = self.potential(t.counts, t.budgets, t.squadSizes)
+        nextPotential = np.where(t.dones, 0.0, self.potential(t.nextCounts, t.nextBudgets, t.squadSizes))
+        return self.weight * (self.gamma * nextPotential - potential)
+
+def defaultTerms():
+    return [ScoreReward(), OutcomeReward(), PotentialShaping()]
+
+def evaluateRewards(terms, transitions, players):
+    """
+        Sum of the reward terms, one reward per transition.
+    """
+    rewards = np.zeros(len(transitions.actions), dtype=np.float64)
+    for term in terms:
+        rewards += term(transitions, players)
+    return rewards
+
+class Curriculum(object):
+
+    def __init__(self, stages):
+        """
+            stages is a list of (startStep, settings), settings are configure() keywords,
+            e.g. {'budget': 1500, 'formation': '4-3-3'}. Later stages update earlier ones.
+        """
+        self.stages = sorted(stages, key=lambda stage: stage[0])
+        for startStep, settings in self.stages:
+            unknown = set(settings) - set(CURRICULUM_SETTINGS)
+            if unknown:
+                raise ValueError("Unknown curriculum settings {} at step {}, expected {}".format(
+                        sorted(unknown), startStep, CURRICULUM_SETTINGS))
+            if 'budget' in settings and not settings['budget'] > 0:
+                raise ValueError("Curriculum budget has to be positive, got {} at step {}".format(
+                        settings['budget'], startStep))
+            if 'formation' in settings:
+                getFormation(settings['formation'])
+
+    def keys(self):
+        return set(key for _, settings in self.stages for key in settings)
+
+    def validate(self, env):
+        """
+            Raise ValueError when env can not apply every stage.
+        """
+        configure = getattr(env, 'configure', None)
+        if configure is None:
+            raise ValueError("{} has no configure(), it can not follow a curriculum".format(type(env).__name__))
+        unsupported = self.keys() - set(inspect.signature(configure).parameters)
+        if unsupported:
+            raise ValueError("{}.configure() does not take the curriculum settings {}".format(
+                    type(env).__name__, sorted(unsupported)))
+        for startStep, settings in self.stages:
+            if 'formation' in settings:
+                try:
+                    getFormation(settings['formation']).compile(env.players.positionNames)
+                except ValueError as e:
+                    raise ValueError("Curriculum formation at step {}: {}".format(startStep, e))
+
+    @classmethod
+    def linear(cls, budgetStart, budgetEnd, numSteps, numStages = 10, formations = ()):
+        """
+            Budget moving from budgetStart to budgetEnd in numStages steps over numSteps env
+            steps, formations is a list of (startStep, formation).
+        """
+        stages = [(int(numSteps * i / max(numStages - 1, 1)), {'budget': float(budget)})
+                  for i, budget in enumerate(np.linspace(budgetStart, budgetEnd, numStages))]
+        stages += [(step, {'formation': formation}) for step, formation in formations]
+        return cls(stages)
+
+    def settings(self, step):
+        settings = {}
+        for startStep, stageSettings in self.stages:
+            if startStep > step:
+                break
+            settings.update(stageSettings)
+        return settings
+
+class CurriculumState(object):
+
+    def __init__(self, curriculum):
+        self.curriculum = curriculum
+        self.applied = {}
+
+    def update(self, env, step):
+        """
+            Configure env when the settings for step changed since the last call.
+        """
+        if self.curriculum is None:
+            return
+        settings = self.curriculum.settings(step)
+        changed = dict((key, value) for key, value in settings.items() if self.applied.get(key) is not value)
+        if changed:
+            env.configure(**changed)
+            self.applied.update(changed)
+
+class ShapedReward(gym.Wrapper):
+    """
+        Replaces the reward of a PlayerSelector2Env/PlayerSelector3Env with the sum
+        of terms, the env reward is kept in info['env_reward'].
+    """
+
+    def __init__(self, env, terms = None, curriculum = None):
+        super(ShapedReward, self).__init__(env)
+        if curriculum is not None:
+            curriculum.validate(env.unwrapped)
+        self.terms = defaultTerms() if terms is None else list(terms)
+        self.curriculum = CurriculumState(curriculum)
+        self.numSteps = 0
+
+    def reset(self, **kwargs):
+        self.curriculum.update(self.env.unwrapped, self.numSteps)
+        return self.env.reset(**kwargs)
+
+    def step(self, action):
+        unwrapped = self.env.unwrapped
+        before = unwrapped.state
+        squadSize = picksSize(unwrapped)
+        obs, reward, done, info = self.env.step(action)
+        after = unwrapped.state
+        transitions = Transitions(np.array([before[0]]), np.array([after[0]]),
+                                  np.array([before[-2]], dtype=np.float64), np.array([after[-2]], dtype=np.float64),
+                                  np.array([action]), np.array([done]), np.array([squadSize]))
+        info['env_reward'] = reward
+        self.numSteps += 1
+        return obs, float(evaluateRewards(self.terms, transitions, unwrapped.players)[0]), done, info
+
+class ShapedVecReward(VectorEnvWrapper):
+    """
+        ShapedReward for PlayerSelector3VecEnv, every batch is scored at once.
+    """
+
+    def __init__(self, env, terms = None, curriculum = None):
+        super(ShapedVecReward, self).__init__(env)
+        if curriculum is not None:
+            curriculum.validate(env)
+        self.terms = defaultTerms() if terms is None else list(terms)
+        self.curriculum = CurriculumState(curriculum)
+        self.numSteps = 0
+        self._before = None
+
+    def reset_wait(self, **kwargs):
+        self.curriculum.update(self.env, self.numSteps)
+        return self.env.reset_wait(**kwargs)
+
+    def step_async(self, actions):
+        env = self.env
+        self._before = (env.playersCount.copy(), env.budget.copy(), env.rowSquadSize.copy())
+        self.env.step_async(actions)
+
+    def step_wait(self):
+        env = self.env
+        actions = env._actions
+        counts, budgets, squadSizes = self._before
+        obs, rewards, dones, infos = env.step_wait()
+        nextCounts = obs[:, 0].astype(np.int64)
+        nextBudgets = obs[:, -2].astype(np.float64)
+        if dones.any():
+            nextCounts[dones] = infos['terminal_observation'][:, 0]
+            nextBudgets[dones] = infos['terminal_observation'][:, -2]
+        transitions = Transitions(counts, nextCounts, budgets, nextBudgets, actions, dones, squadSizes)
+        infos['env_reward'] = rewards
+        self.numSteps += len(actions)
+        self.curriculum.update(env, self.numSteps)
+        return obs, evaluateRewards(self.terms, transitions, env.players), dones, infos
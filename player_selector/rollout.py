@@ -0,0 +1,223 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import gym
+import numpy as np
+
+from player_selector.envs.player_table import sharePlayerTable, attachPlayerTable
+from player_selector.envs.rng import spawnSeeds
+
+"""
+    Multi-process rollout runner for the player_selector envs.
+    Every worker process steps a contiguous slice of env instances.
+    Observations, actions, rewards and dones are exchanged through
+    shared memory arrays, the pipes only carry a one byte command.
+    Envs with a roster (PlayerSelector2Env, PlayerSelector3Env) get the
+    roster mapped read only from shared memory, it is loaded only once
+    in the parent process.
+
+    Buffers:
+        observations    (numEnvs, obsDim)   float32, Dict observations (observationMode='rich')
+                                            flattened in key order, see flatObservation
+        actions         (numEnvs,)          int64
+        rewards         (numEnvs,)          float64
+        dones           (numEnvs,)          bool
+
+    Finished envs are reset by their worker, so the observation of a done
+    env is already the first observation of its next episode.
+
+    With a seed every env gets its own child of SeedSequence(seed), so a run
+    is reproducible for any numWorkers.
+"""
+CMD_RESET = b'r'
+CMD_STEP = b's'
+CMD_CLOSE = b'c'
+ACK = b'k'
+
+def observationSize(space):
+    if isinstance(space, gym.spaces.Discrete):
+        return 1
+    if space.shape is None:
+        return gym.spaces.flatdim(space)
+    return int(np.prod(space.shape))
+
+def flatObservation(space, obs):
+    """
+        obs as one row of observationSize(space) values, Dict and Tuple observations
+        are concatenated in key order like gym.spaces.flatten.
+    """
+    if space.shape is None:
+        return gym.spaces.flatten(space, obs)
+    return np.ravel(obs)
+
+def createSharedArray(shape, dtype):
+    dtype = np.dtype(dtype)
+    block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+def attachSharedArray(spec):
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+def rolloutWorker(conn, envId, envKwargs, start, stop, bufferSpecs, tableSpec, seeds):
+    blocks = []
+    buffers = {}
+    for key, spec in bufferSpecs.items():
+        block, buffers[key] = attachSharedArray(spec)
+        blocks.append(block)
+    observations = buffers['observations']
+    actions = buffers['actions']
+    rewards = buffers['rewards']
+    dones = buffers['dones']
+
+    envKwargs = dict(envKwargs)
+    if tableSpec is not None:
+        envKwargs['players'] = attachPlayerTable(tableSpec)
+    envs = [gym.make(envId, **envKwargs) for _ in range(start, stop)]
+    space = envs[0].observation_space if envs else None
+    if seeds is not None:
+        for env, seedSequence in zip(envs, seeds):
+            env.seed(seedSequence)
+
+    while True:
+        cmd = conn.recv_bytes()
+        if cmd == CMD_STEP:
+            for row, env in enumerate(envs, start):
+                obs, reward, done, _ = env.step(int(actions[row]))
+                if done:
+                    obs = env.reset()
+                observations[row] = flatObservation(space, obs)
+                rewards[row] = reward
+                dones[row] = done
+        elif cmd == CMD_RESET:
+            for row, env in enumerate(envs, start):
+                observations[row] = flatObservation(space, env.reset())
+            rewards[start:stop] = 0
+            dones[start:stop] = False
+        elif cmd == CMD_CLOSE:
+            for env in envs:
+                env.close()
+            conn.send_bytes(ACK)
+            break
+        conn.send_bytes(ACK)
+    conn.close()
+
+class RolloutRunner(object):
+
+    def __init__(self, envId, numEnvs, numWorkers = None, envKwargs = None, context = None, seed = None):
+        self.envId = envId
+        self.numEnvs = numEnvs
+        self.numWorkers = min(numWorkers or mp.cpu_count(), numEnvs)
+        envKwargs = dict(envKwargs or {})
+
+        # One local env to find the spaces and the roster to share
+        env = gym.make(envId, **envKwargs)
+        self.observation_space = env.observation_space
+        self.action_space = env.action_space
+        players = getattr(env.unwrapped, 'players', None)
+        env.close()
+
+        self.blocks = []
+        tableSpec = None
+        if players is not None:
+            # A roster passed in envKwargs is shared too instead of pickled per worker
+            envKwargs.pop('players', None)
+            tableSpec, tableBlocks = sharePlayerTable(players)
+            self.blocks.extend(tableBlocks)
+
+        shapes = {
+            'observations': ((numEnvs, observationSize(self.observation_space)), np.float32),
+            'actions': ((numEnvs,), np.int64),
+            'rewards': ((numEnvs,), np.float64),
+            'dones': ((numEnvs,), np.bool_),
+        }
+        bufferSpecs = {}
+        self.buffers = {}
+        for key, (shape, dtype) in shapes.items():
+            block, self.buffers[key] = createSharedArray(shape, dtype)
+            self.blocks.append(block)
+            bufferSpecs[key] = (block.name, shape, np.dtype(dtype).str)
+        self.observations = self.buffers['observations']
+        self.actions = self.buffers['actions']
+        self.rewards = self.buffers['rewards']
+        self.dones = self.buffers['dones']
+
+        seeds = spawnSeeds(seed, numEnvs) if seed is not None else None
+        ctx = context or mp.get_context()
+        bounds = np.linspace(0, numEnvs, self.numWorkers + 1).astype(int)
+        self.conns = []
+        self.processes = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parentConn, childConn = ctx.Pipe()
+            process = ctx.Process(target=rolloutWorker, daemon=True,
+                                  args=(childConn, envId, envKwargs, int(start), int(stop),
+                                        bufferSpecs, tableSpec,
+                                        seeds[start:stop] if seeds is not None else None))
+            process.start()
+            childConn.close()
+            self.conns.append(parentConn)
+            self.processes.append(process)
+        self.closed = False
+
+    def broadcast(self, cmd):
+        for conn in self.conns:
+            conn.send_bytes(cmd)
+        for conn in self.conns:
+            conn.recv_bytes()
+
+    def reset(self):
+        self.broadcast(CMD_RESET)
+        return self.observations.copy()
+
+    def step(self, actions):
+        self.actions[:] = actions
+        self.broadcast(CMD_STEP)
+        return self.observations.copy(), self.rewards.copy(), self.dones.copy()
+
+    def collect(self, policy, numSteps):
+        """
+            Run numSteps batched steps, policy maps observations (numEnvs, obsDim)
+            to actions (numEnvs,). Returns arrays with a leading numSteps axis.
+        """
+        observations = np.empty((numSteps,) + self.observations.shape, dtype=np.float32)
+        actions = np.empty((numSteps, self.numEnvs), dtype=np.int64)
+        rewards = np.empty((numSteps, self.numEnvs), dtype=np.float64)
+        dones = np.empty((numSteps, self.numEnvs), dtype=np.bool_)
+        obs = self.observations
+        for t in range(numSteps):
+            observations[t] = obs
+            actions[t] = policy(observations[t])
+            self.actions[:] = actions[t]
+            self.broadcast(CMD_STEP)
+            rewards[t] = self.rewards
+            dones[t] = self.dones
+        return observations, actions, rewards, dones
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for conn in self.conns:
+            try:
+                conn.send_bytes(CMD_CLOSE)
+                conn.recv_bytes()
+            except (BrokenPipeError, EOFError):
+                pass
+            conn.close()
+        for process in self.processes:
+            process.join()
+        self.buffers = self.observations = self.actions = self.rewards = self.dones = None
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        if hasattr(self, 'closed'):
+            self.close()
@@ -0,0 +1,187 @@
+from collections import namedtuple
+import numpy as np
+
+from player_selector.envs.formation import Formation, FORMATION_433
+from player_selector.envs.playerselector3_env import INITIAL_BUDGET
+from player_selector.solver import paretoCandidates
+
+"""
+    Non learning squad builders for the PlayerSelector3Env roster.
+
+    Slots are filled position by position, and inside a position players are
+    taken in candidate list order, so every squad is built in exactly one way.
+    Candidate lists are presorted once per position, by score or by score per
+    value ('ratio'), after dropping players that can never be needed (see
+    solver.paretoCandidates).
+
+    Before a pick the budget must cover the player plus the cheapest way to fill
+    the remaining slots. Candidates over the largest budget left in any beam are
+    removed from the lists as the search goes, since budgets only shrink.
+
+    greedySquad     takes the first feasible candidate of every slot
+    beamSearch      keeps the width best partial squads by score, every expansion
+                    is one (beams, candidates) array operation
+
+    Squads come back with playerIds in pick order, so they can be replayed in
+    the env as warm start trajectories.
+"""
+Squad = namedtuple('Squad', ['playerIds', 'score', 'value'])
+
+SORT_KEYS = ('score', 'ratio')
+
+class PositionCandidates(object):
+    """
+        Candidates of one position sorted by key, with the cheapest cost of
+        filling k more slots from rank i onwards in reserve[k, i].
+    """
+
+    def __init__(self, ids, values, scores, capacity, key):
+        if key == 'score':
+            order = np.lexsort((ids, -scores[ids]))
+        elif key == 'ratio':
+            ratio = scores[ids] / np.maximum(values[ids], 1e-9)
+            order = np.lexsort((ids, -ratio))
+        else:
+            raise ValueError("key must be one of {}".format(SORT_KEYS))
+        self.ids = ids[order]
+        self.values = values[self.ids]
+        self.scores = scores[self.ids]
+        self.capacity = capacity
+        self.reserve = self.buildReserve(self.values, capacity)
+
+    @staticmethod
+    def buildReserve(values, capacity):
+        size = len(values)
+        reserve = np.full((capacity + 1, size + 1), np.inf)
+        reserve[0] = 0
+        # Cheapest k values of every suffix, kept sorted while walking backwards
+        cheapest = []
+        for i in range(size - 1, -1, -1):
+            cheapest.append(values[i])
+            cheapest.sort()
+            del cheapest[capacity:]
+            sums = np.cumsum(cheapest)
+            reserve[1:len(sums) + 1, i] = sums
+        return reserve
+
+    def prune(self, maxBudget, ranks):
+        """
+            Drop candidates that no longer fit any budget, keeping reserve valid.
+            Returns ranks moved to the pruned list, a rank of a dropped candidate
+            moves to the kept candidate before it.
+        """
+        keep = self.values <= maxBudget
+        if keep.all():
+            return ranks
+        kept = np.cumsum(keep) - 1
+        self.ids = self.ids[keep]
+        self.values = self.values[keep]
+        self.scores = self.scores[keep]
+        self.reserve = self.buildReserve(self.values, self.capacity)
+        return np.where(ranks >= 0, kept[np.maximum(ranks, 0)], ranks)
+
+def positionCandidates(players, capacities, key, budget):
+    values = np.asarray(players.values, dtype=np.float64)
+    scores = np.asarray(players.scores, dtype=np.float64)
+    positions = np.asarray(players.positions)
+    lists = []
+    for code, capacity in enumerate(capacities):
+        ids = np.flatnonzero((positions == code) & (values <= budget) & players.available)
+        if len(ids) < capacity:
+            raise ValueError("Not enough affordable players for position {}".format(code))
+        ids = paretoCandidates(ids, values, scores, capacity) if capacity > 0 else ids[:0]
+        lists.append(PositionCandidates(ids, values, scores, capacity, key))
+    return lists
+
+def resolveCapacities(players, formation):
+    if isinstance(formation, Formation):
+        capacities = formation.capacities(players.positionNames)
+        if formation.squadSize != capacities.sum():
+            raise ValueError("Only formations that fill every slot can be searched")
+        return capacities
+    return np.asarray(formation, dtype=np.int64)
+
+def laterReserve(lists, capacities):
+    """
+        later[p] cheapest cost of filling every position after p.
+    """
+    later = np.zeros(len(capacities) + 1)
+    for code in range(len(capacities) - 1, -1, -1):
+        later[code] = later[code + 1] + lists[code].reserve[capacities[code], 0]
+    return later
+
+def beamSearch(players, formation = FORMATION_433, budget = INITIAL_BUDGET, width = 64, key = 'score'):
+    """
+        Returns up to width complete squads, best score first.
+    """
+    capacities = resolveCapacities(players, formation)
+    lists = positionCandidates(players, capacities, key, budget)
+    later = laterReserve(lists, capacities)
+
+    # Beams: picked ids, rank of the last pick in the current position, budget, score
+    picks = np.zeros((1, 0), dtype=np.int64)
+    lastRank = np.full(1, -1, dtype=np.int64)
+    budgets = np.array([float(budget)])
+    scores = np.zeros(1)
+
+    for code, capacity in enumerate(capacities):
+        candidates = lists[code]
+        for slot in range(capacity):
+            lastRank = candidates.prune(budgets.max(), lastRank)
+            remaining = capacity - slot - 1
+            numCandidates = len(candidates.ids)
+            ranks = np.arange(numCandidates)
+            # Budget that has to stay for the rest of this position and the later ones
+            reserve = candidates.reserve[remaining, 1:] + later[code + 1]
+            feasible = ((ranks[None, :] > lastRank[:, None])
+                        & (candidates.values[None, :] + reserve[None, :] <= budgets[:, None]))
+            if not feasible.any():
+                return []
+            expanded = np.where(feasible, scores[:, None] + candidates.scores[None, :], -np.inf).ravel()
+            numValid = int(feasible.sum())
+            if numValid > width:
+                best = np.argpartition(-expanded, width - 1)[:width]
+            else:
+                best = np.flatnonzero(np.isfinite(expanded))
+            beam, rank = np.divmod(best, numCandidates)
+            picks = np.concatenate([picks[beam], candidates.ids[rank][:, None]], axis=1)
+            budgets = budgets[beam] - candidates.values[rank]
+            scores = expanded[best]
+            lastRank = rank if remaining > 0 else np.full(len(beam), -1, dtype=np.int64)
+
+    order = np.argsort(-scores, kind='stable')
+    values = np.asarray(players.values)
+    return [Squad(picks[i], float(scores[i]), float(values[picks[i]].sum())) for i in order]
+
+def greedySquad(players, formation = FORMATION_433, budget = INITIAL_BUDGET, key = 'ratio'):
+    """
+        Fill the slots one by one with the first feasible candidate in key order.
+    """
+    capacities = resolveCapacities(players, formation)
+    lists = positionCandidates(players, capacities, key, budget)
+    later = laterReserve(lists, capacities)
+    picked = []
+    remainingBudget = float(budget)
+    score = 0.0
+    for code, capacity in enumerate(capacities):
+        candidates = lists[code]
+        rank = -1
+        for slot in range(capacity):
+            rank = int(candidates.prune(remainingBudget, np.array(rank)))
+            remaining = capacity - slot - 1
+            start = rank + 1
+            reserve = candidates.reserve[remaining, start + 1:] + later[code + 1]
+            feasible = np.flatnonzero(candidates.values[start:] + reserve <= remainingBudget)
+            if len(feasible) == 0:
+                return None
+            rank = start + int(feasible[0])
+            picked.append(int(candidates.ids[rank]))
+            remainingBudget -= candidates.values[rank]
+            score += candidates.scores[rank]
+    return Squad(np.array(picked, dtype=np.int64), float(score), float(budget) - remainingBudget)
+
+def squadActions(squad):
+    """
+        Actions that build squad in the env, in pick order.
+    """
+    return squad.playerIds.tolist()
@@ -0,0 +1,296 @@
+import asyncio
+import socket
+import struct
+import gym
+import numpy as np
+
+import player_selector
+from player_selector.envs.playerselector3_vec_env import PlayerSelector3VecEnv
+from player_selector.envs.draft_vec_env import DraftVecEnv
+from player_selector.rollout import observationSize, flatObservation
+
+"""
+    Env server for actor processes that share one environment host.
+
+    EnvServer owns numEnvs env slots of one registered env. Every client holds
+    one slot. Step requests of all clients are collected into micro batches,
+    a batch is sent when every connected client is waiting, when maxBatch
+    requests are queued or batchWindow seconds after its first request, and
+    is then stepped in one call. PlayerSelector3-v0 and Draft-v0 are stepped as
+    rows of their batched env, other envs one after the other.
+
+    Clients:
+        EnvClient       blocking client over a Unix socket, for actor processes
+        LocalClient     asyncio client in the server's own event loop, no socket
+
+    Wire format (little endian):
+        hello       server -> client    slot uint32, obsDim uint32, slot NO_SLOT when all
+                                        slots are in use, the server then closes the connection
+        request     client -> server    cmd uint8, action int64
+        reply       server -> client    reward float64, done uint8, obsDim float32
+
+    A done reply carries the last observation of the episode, call reset()
+    before the next episode.
+    An action outside [0, nA) is not queued, the client gets a reply with
+    done = REPLY_ERROR and keeps its connection, EnvClient raises ValueError.
+
+    Example:
+        server = EnvServer('PlayerSelector3-v0', 64)
+        asyncio.run(server.serveUnix('/tmp/player_selector.sock'))     # host
+        client = EnvClient('/tmp/player_selector.sock')                 # actor
+        obs = client.reset()
+        obs, reward, done = client.step(action)
+"""
+CMD_RESET = 0
+CMD_STEP = 1
+REPLY_ERROR = 2
+NO_SLOT = 0xFFFFFFFF
+
+HELLO = struct.Struct('<II')
+REQUEST = struct.Struct('<Bq')
+REPLY_HEADER = struct.Struct('<dB')
+
+VEC_ENVS = {'PlayerSelector3-v0': PlayerSelector3VecEnv, 'Draft-v0': DraftVecEnv}
+
+class EnvBackend(object):
+    """
+        numEnvs separate env instances, a batch is stepped in a loop.
+    """
+
+    def __init__(self, envId, numEnvs, envKwargs):
+        self.envs = [gym.make(envId, **envKwargs) for _ in range(numEnvs)]
+        self.observation_space = self.envs[0].observation_space
+        self.action_space = self.envs[0].action_space
+
+    def reset(self, slot):
+        return np.asarray(flatObservation(self.observation_space, self.envs[slot].reset()), dtype=np.float32)
+
+    def step(self, slots, actions):
+        observations = np.empty((len(slots), observationSize(self.observation_space)), dtype=np.float32)
+        rewards = np.empty(len(slots))
+        dones = np.empty(len(slots), dtype=bool)
+        for i, (slot, action) in enumerate(zip(slots.tolist(), actions.tolist())):
+            obs, rewards[i], dones[i], _ = self.envs[slot].step(action)
+            observations[i] = flatObservation(self.observation_space, obs)
+        return observations, rewards, dones
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+class VecBackend(object):
+    """
+        One batched env, a batch only steps the rows of its slots.
+    """
+
+    def __init__(self, envClass, numEnvs, envKwargs):
+        self.env = envClass(numEnvs, **envKwargs)
+        self.observation_space = self.env.single_observation_space
+        self.action_space = self.env.single_action_space
+
+    def reset(self, slot):
+        rows = np.array([slot])
+        self.env.resetRows(rows)
+        return self.env.observeRows(rows)[0]
+
+    def step(self, slots, actions):
+        observations, rewards, dones, infos = self.env.stepRows(slots, actions)
+        if dones.any():
+            observations[dones] = infos['terminal_observation']
+        return observations, rewards, dones
+
+    def close(self):
+        self.env.close()
+
+class EnvServer(object):
+
+    def __init__(self, envId, numEnvs, envKwargs = None, maxBatch = None, batchWindow = 0.001):
+        envKwargs = dict(envKwargs or {})
+        if envId in VEC_ENVS:
+            self.backend = VecBackend(VEC_ENVS[envId], numEnvs, envKwargs)
+        else:
+            self.backend = EnvBackend(envId, numEnvs, envKwargs)
+        self.observationSize = observationSize(self.backend.observation_space)
+        self.nA = self.backend.action_space.n
+        self.errorObservation = np.zeros(self.observationSize, dtype=np.float32)
+        self.maxBatch = maxBatch or numEnvs
+        self.batchWindow = batchWindow
+        self.freeSlots = list(range(numEnvs - 1, -1, -1))
+        self.numClients = 0
+        self.pending = []
+        self.batchReady = None
+        self.batchTimer = None
+        self.batcher = None
+        self.stats = {'batches': 0, 'steps': 0}
+
+    def acquireSlot(self):
+        if not self.freeSlots:
+            raise RuntimeError("All {} env slots are in use".format(self.numClients))
+        self.numClients += 1
+        if self.batcher is None:
+            self.batchReady = asyncio.Event()
+            self.batcher = asyncio.ensure_future(self.runBatches())
+        return self.freeSlots.pop()
+
+    def releaseSlot(self, slot):
+        self.numClients -= 1
+        self.freeSlots.append(slot)
+        if self.pending and len(self.pending) >= self.numClients:
+            self.batchReady.set()
+
+    def reset(self, slot):
+        return self.backend.reset(slot)
+
+    def step(self, slot, action):
+        """
+            Queue one step, resolves to (observation, reward, done) when its batch ran.
+            Raises ValueError for an action outside the action space.
+        """
+        if not 0 <= action < self.nA:
+            raise ValueError("Action {} is outside [0, {})".format(action, self.nA))
+        future = asyncio.get_event_loop().create_future()
+        self.pending.append((slot, action, future))
+        if len(self.pending) >= min(self.maxBatch, self.numClients):
+            self.batchReady.set()
+        elif len(self.pending) == 1:
+            self.batchTimer = asyncio.get_event_loop().call_later(self.batchWindow, self.batchReady.set)
+        return future
+
+    async def runBatches(self):
+        while True:
+            await self.batchReady.wait()
+            self.batchReady.clear()
+            # a batch that filled early must not cut the window of the next one short
+            if self.batchTimer is not None:
+                self.batchTimer.cancel()
+                self.batchTimer = None
+            while self.pending:
+                batch, self.pending = self.pending[:self.maxBatch], self.pending[self.maxBatch:]
+                self.stepBatch(batch)
+
+    def stepBatch(self, batch):
+        slots = np.fromiter((slot for slot, _, _ in batch), dtype=np.int64, count=len(batch))
+        actions = np.fromiter((action for _, action, _ in batch), dtype=np.int64, count=len(batch))
+        try:
+            observations, rewards, dones = self.backend.step(slots, actions)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.stats['batches'] += 1
+        self.stats['steps'] += len(batch)
+        for i, (_, _, future) in enumerate(batch):
+            if not future.cancelled():
+                future.set_result((observations[i], float(rewards[i]), bool(dones[i])))
+
+    def connect(self):
+        return LocalClient(self)
+
+    async def handleConnection(self, reader, writer):
+        try:
+            slot = self.acquireSlot()
+        except RuntimeError:
+            writer.write(HELLO.pack(NO_SLOT, 0))
+            writer.close()
+            return
+        try:
+            writer.write(HELLO.pack(slot, self.observationSize))
+            await writer.drain()
+            while True:
+                try:
+                    request = await reader.readexactly(REQUEST.size)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                cmd, action = REQUEST.unpack(request)
+                if cmd == CMD_RESET:
+                    obs, reward, done = self.reset(slot), 0.0, False
+                else:
+                    try:
+                        obs, reward, done = await self.step(slot, action)
+                    except ValueError:
+                        obs, reward, done = self.errorObservation, float('nan'), REPLY_ERROR
+                writer.write(REPLY_HEADER.pack(reward, done) + obs.astype('<f4', copy=False).tobytes())
+                # a slow client must not let the write buffer grow without limit
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    break
+        finally:
+            self.releaseSlot(slot)
+            writer.close()
+
+    async def serveUnix(self, path):
+        server = await asyncio.start_unix_server(self.handleConnection, path)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self.batchTimer is not None:
+            self.batchTimer.cancel()
+            self.batchTimer = None
+        if self.batcher is not None:
+            self.batcher.cancel()
+            self.batcher = None
+        self.backend.close()
+
+class LocalClient(object):
+
+    def __init__(self, server):
+        self.server = server
+        self.slot = server.acquireSlot()
+
+    async def reset(self):
+        return self.server.reset(self.slot)
+
+    async def step(self, action):
+        return await self.server.step(self.slot, int(action))
+
+    def close(self):
+        if self.slot is not None:
+            self.server.releaseSlot(self.slot)
+            self.slot = None
+
+class EnvClient(object):
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.slot, self.observationSize = HELLO.unpack(self.receive(HELLO.size))
+        if self.slot == NO_SLOT:
+            self.sock.close()
+            raise ConnectionRefusedError("All env slots of the server at {} are in use".format(path))
+        self.replySize = REPLY_HEADER.size + 4 * self.observationSize
+
+    def receive(self, size):
+        data = bytearray(size)
+        view = memoryview(data)
+        while size:
+            received = self.sock.recv_into(view[len(data) - size:])
+            if not received:
+                raise ConnectionError("Env server closed the connection")
+            size -= received
+        return data
+
+    def request(self, cmd, action):
+        self.sock.sendall(REQUEST.pack(cmd, action))
+        reply = self.receive(self.replySize)
+        reward, done = REPLY_HEADER.unpack_from(reply)
+        if done == REPLY_ERROR:
+            raise ValueError("Env server rejected action {}".format(action))
+        obs = np.frombuffer(reply, dtype='<f4', offset=REPLY_HEADER.size)
+        return obs, reward, bool(done)
+
+    def reset(self):
+        return self.request(CMD_RESET, 0)[0]
+
+    def step(self, action):
+        return self.request(CMD_STEP, int(action))
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,151 @@
+import heapq
+from collections import namedtuple
+import numpy as np
+
+from player_selector.envs.formation import Formation, FORMATION_433
+from player_selector.envs.playerselector3_env import INITIAL_BUDGET
+
+"""
+    Exact solver for the squad selection problem behind PlayerSelector3Env.
+    Pick exactly capacities[p] players of every position p, with a total
+    value of at most budget, maximizing the total score.
+
+    1. Dominance pruning, per position a player is dropped when at least
+       capacities[p] other players of the same position cost no more and
+       score no less. Some optimal squad never needs a dropped player.
+    2. Dynamic programming per position over (players picked, budget used),
+       vectorized over the budget axis.
+    3. Max-plus convolution of the per position tables over the budget.
+
+    capacities is a Formation or the number of players per position code.
+    Formations with a squadSize below their slots are not supported.
+    Player values are mapped to integer budget units with resolution,
+    values that are not a multiple of resolution raise a ValueError.
+"""
+DEFAULT_CAPACITIES = FORMATION_433
+
+OptimalSquad = namedtuple('OptimalSquad', ['playerIds', 'score', 'value'])
+
+def integerCosts(values, resolution):
+    costs = np.asarray(values, dtype=np.float64) / resolution
+    rounded = np.round(costs)
+    if not np.allclose(costs, rounded):
+        raise ValueError("Player values are not multiples of resolution {}".format(resolution))
+    if (rounded < 0).any():
+        raise ValueError("Player values can not be negative")
+    return rounded.astype(np.int64)
+
+def paretoCandidates(ids, costs, scores, capacity):
+    """
+        Keep the players of one position that are dominated by fewer than
+        capacity other players, sorted by cost.
+    """
+    order = ids[np.lexsort((ids, -scores[ids], costs[ids]))]
+    best = []
+    kept = []
+    for playerId in order:
+        score = scores[playerId]
+        if len(best) < capacity:
+            kept.append(playerId)
+            heapq.heappush(best, score)
+        elif best[0] < score:
+            kept.append(playerId)
+            heapq.heapreplace(best, score)
+    return np.array(kept, dtype=np.int64)
+
+def positionTable(candidates, costs, scores, capacity, budget):
+    """
+        table[c, b] best score of exactly c candidates with total cost <= b.
+        take[i, c, b] is True when candidate i is used for table[c, b]
+        after the first i + 1 candidates.
+    """
+    table = np.full((capacity + 1, budget + 1), -np.inf)
+    table[0] = 0
+    take = np.zeros((len(candidates), capacity + 1, budget + 1), dtype=bool)
+    for i, playerId in enumerate(candidates):
+        cost, score = costs[playerId], scores[playerId]
+        if cost > budget:
+            continue
+        for c in range(capacity, 0, -1):
+            withPlayer = table[c - 1, :budget + 1 - cost] + score
+            better = withPlayer > table[c, cost:]
+            table[c, cost:][better] = withPlayer[better]
+            take[i, c, cost:] = better
+    return table, take
+
+def positionSquad(candidates, costs, take, capacity, budget):
+    picked = []
+    c, b = capacity, budget
+    for i in range(len(candidates) - 1, -1, -1):
+        if c == 0:
+            break
+        if take[i, c, b]:
+            picked.append(candidates[i])
+            b -= costs[candidates[i]]
+            c -= 1
+    return picked
+
+def maxPlusConvolve(left, right):
+    """
+        out[b] = max(left[b1] + right[b - b1]), with the best b1 for every b.
+    """
+    size = len(left)
+    b = np.arange(size)
+    sums = left[None, :] + np.where(b[:, None] >= b[None, :], right[(b[:, None] - b[None, :]) % size], -np.inf)
+    split = sums.argmax(axis=1)
+    return sums[b, split], split
+
+def solveOptimalSquad(players, capacities = DEFAULT_CAPACITIES, budget = INITIAL_BUDGET, resolution = 1):
+    """
+        Best squad for the PlayerTable players, capacities is the number of
+        players to pick for every position code, unavailable players are left out.
+        Returns OptimalSquad(playerIds, score, value).
+    """
+    if isinstance(capacities, Formation):
+        if capacities.squadSize != capacities.capacities(players.positionNames).sum():
+            raise ValueError("Only formations that fill every slot can be solved")
+        capacities = capacities.capacities(players.positionNames)
+    costs = integerCosts(players.values, resolution)
+    scores = np.asarray(players.scores, dtype=np.float64)
+    positions = np.asarray(players.positions)
+    budgetUnits = int(np.floor(budget / resolution + 1e-9))
+
+    tables = []
+    for code, capacity in enumerate(capacities):
+        ids = np.flatnonzero((positions == code) & players.available)
+        if len(ids) < capacity:
+            raise ValueError("Not enough players for position {}".format(code))
+        candidates = paretoCandidates(ids, costs, scores, capacity)
+        table, take = positionTable(candidates, costs, scores, capacity, budgetUnits)
+        tables.append((candidates, table[capacity], take, capacity))
+
+    # Combine positions left to right, remembering the budget split
+    combined = tables[0][1]
+    splits = []
+    for _, best, _, _ in tables[1:]:
+        combined, split = maxPlusConvolve(combined, best)
+        splits.append(split)
+    if not np.isfinite(combined[budgetUnits]):
+        raise ValueError("No squad fits in a budget of {}".format(budget))
+
+    # Walk the splits back to the budget of every position
+    positionBudgets = []
+    b = budgetUnits
+    for split in reversed(splits):
+        leftBudget = split[b]
+        positionBudgets.append(b - leftBudget)
+        b = leftBudget
+    positionBudgets.append(b)
+    positionBudgets.reverse()
+
+    playerIds = []
+    for (candidates, _, take, capacity), b in zip(tables, positionBudgets):
+        playerIds.extend(positionSquad(candidates, costs, take, capacity, b))
+    playerIds = np.array(sorted(playerIds), dtype=np.int64)
+    return OptimalSquad(playerIds, float(scores[playerIds].sum()), float(np.asarray(players.values)[playerIds].sum()))
+
+def optimalScore(players, capacities = DEFAULT_CAPACITIES, budget = INITIAL_BUDGET, resolution = 1):
+    return solveOptimalSquad(players, capacities, budget, resolution).score
+
+def regret(score, players, capacities = DEFAULT_CAPACITIES, budget = INITIAL_BUDGET, resolution = 1):
+    return optimalScore(players, capacities, budget, resolution) - score
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from player_selector.envs.player_table import PlayerTable
+from player_selector.envs.formation import POSITIONS
+
+def makeRoster(numPlayers = 40, seed = 0):
+    """
+        Small random roster with every position of POSITIONS, values between 10 and 200.
+    """
+    rng = np.random.default_rng(seed)
+    positions = np.arange(numPlayers) % len(POSITIONS)
+    return PlayerTable(['player{}'.format(i) for i in range(numPlayers)],
+                       rng.integers(10, 200, numPlayers).astype(np.float64),
+                       rng.uniform(0, 100, numPlayers).round(1), positions, POSITIONS)
+
+@pytest.fixture
+def roster():
+    return makeRoster()
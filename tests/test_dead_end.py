@@ -0,0 +1,67 @@
+import numpy as np
+
+from player_selector.envs.player_table import PlayerTable
+from player_selector.envs.formation import POSITIONS
+from player_selector.envs.playerselector2_env import PlayerSelector2Env
+from player_selector.envs.playerselector3_env import PlayerSelector3Env
+from player_selector.envs.playerselector3_vec_env import PlayerSelector3VecEnv
+from player_selector.envs.draft_env import DraftEnv
+from player_selector.envs.draft_vec_env import DraftVecEnv
+
+def deadEndRoster():
+    # 4 players per position at 10, one goalkeeper at 95
+    positions = np.repeat(np.arange(len(POSITIONS)), 4)
+    values = np.full(len(positions), 10.0)
+    values[0] = 95.0
+    return PlayerTable(['p{}'.format(i) for i in range(len(positions))], values,
+                       np.ones(len(positions)), positions, POSITIONS)
+
+def test_dead_end_ends_the_episode():
+    env = PlayerSelector3Env(players=deadEndRoster(), budget=100)
+    env.reset()
+    obs, reward, done, info = env.step(0)
+    assert done and reward == -1000 and info['deadEnd']
+    assert not env.actionMask().any()
+
+def test_dead_end_in_the_vec_env():
+    env = PlayerSelector3VecEnv(2, players=deadEndRoster(), budget=100)
+    env.reset()
+    obs, rewards, dones, infos = env.step(np.array([0, 1]))
+    assert dones.tolist() == [True, False]
+    assert rewards[0] == -1000 and infos['deadEnd'].tolist() == [True]
+
+def test_dead_end_finishes_only_that_draft_team():
+    env = DraftEnv(players=deadEndRoster(), numTeams=2, budget=100)
+    env.reset()
+    obs, reward, done, info = env.step(0)
+    assert reward == -1000 and not done and info['deadEnds'].tolist() == [0]
+    assert env.team == 1
+
+def test_masked_episodes_never_get_stuck(roster):
+    rng = np.random.default_rng(0)
+    for env in (PlayerSelector2Env(players=roster, budget=500), PlayerSelector3Env(players=roster, budget=500)):
+        for _ in range(50):
+            env.reset()
+            done = False
+            while not done:
+                mask = env.actionMask()
+                assert mask.any()
+                _, _, done, _ = env.step(int(rng.choice(np.flatnonzero(mask))))
+
+def test_draft_vec_env_matches_draft_env(roster):
+    rng = np.random.default_rng(1)
+    vec = DraftVecEnv(3, numTeams=2, players=roster, budget=400, maxEpisodeSteps=10 ** 6)
+    envs = [DraftEnv(players=roster, numTeams=2, budget=400) for _ in range(3)]
+    vec.reset()
+    for env in envs:
+        env.reset()
+    for _ in range(300):
+        masks = vec.actionMasks()
+        assert masks.any(axis=1).all()
+        actions = np.array([rng.choice(np.flatnonzero(mask)) for mask in masks])
+        _, rewards, dones, _ = vec.step(actions)
+        for i, env in enumerate(envs):
+            _, reward, done, _ = env.step(int(actions[i]))
+            assert done == dones[i] and reward == rewards[i]
+            if done:
+                env.reset()
@@ -0,0 +1,20 @@
+import numpy as np
+
+from player_selector.envs.draft_env import DraftEnv, ORDER_LINEAR, ORDER_SNAKE, pickOrder
+
+def test_pick_orders():
+    assert pickOrder(3, ORDER_LINEAR).tolist() == [0, 1, 2]
+    assert pickOrder(3, ORDER_SNAKE).tolist() == [0, 1, 2, 2, 1, 0]
+
+def test_snake_draft_turns_and_taken_players(roster):
+    env = DraftEnv(players=roster, numTeams=3, budget=2000)
+    env.reset()
+    teams = []
+    for action in range(6):
+        teams.append(env.team)
+        env.step(action)
+    assert teams == [0, 1, 2, 2, 1, 0]
+    # a drafted player is taken for every team
+    obs, reward, done, info = env.step(0)
+    assert reward == 0 and info['team'] == 0 and env.team == 0
+    assert not env.actionMask()[:6].any()
@@ -0,0 +1,24 @@
+import multiprocessing as mp
+import numpy as np
+import gym
+
+import player_selector
+from player_selector.rollout import RolloutRunner
+
+def test_runner_matches_local_envs(roster):
+    envKwargs = {'players': roster, 'budget': 500}
+    local = [gym.make('PlayerSelector3-v0', **envKwargs) for _ in range(4)]
+    rng = np.random.default_rng(0)
+    with RolloutRunner('PlayerSelector3-v0', 4, numWorkers=2, envKwargs=envKwargs,
+                       context=mp.get_context('fork')) as runner:
+        observations = runner.reset()
+        np.testing.assert_array_equal(observations, np.array([env.reset() for env in local]))
+        for _ in range(100):
+            actions = rng.integers(0, len(roster), 4)
+            observations, rewards, dones = runner.step(actions)
+            for i, env in enumerate(local):
+                obs, reward, done, _ = env.step(int(actions[i]))
+                if done:
+                    obs = env.reset()
+                np.testing.assert_array_equal(observations[i], obs)
+                assert rewards[i] == reward and dones[i] == done
@@ -0,0 +1,55 @@
+import os
+import numpy as np
+
+from player_selector.envs.formation import POSITIONS
+from player_selector.envs.player_table import readPlayerTable
+from player_selector.envs import roster_cache
+from player_selector.envs.roster_cache import openRosterCache, readRosterMeta, CACHE_SUFFIX
+
+def writeCsv(path, rows):
+    with open(path, 'w') as f:
+        f.write("name;position;value;score\n")
+        for row in rows:
+            f.write("{};{};{};{}\n".format(*row))
+
+ROWS = [("Keeper", "goalkeeper", 50, 10.5), ("Back", "defender", 30, 7.0), ("Wing", "midfielder", 80, 12.25),
+        ("Nine", "attacker", 120, 20.0), ("Nobody", "coach", 5, 1.0)]
+
+def assertSameTable(table, expected):
+    assert list(table.names) == list(expected.names)
+    np.testing.assert_array_equal(table.values, expected.values)
+    np.testing.assert_array_equal(table.scores, expected.scores)
+    np.testing.assert_array_equal(table.positions, expected.positions)
+    assert tuple(table.positionNames) == tuple(expected.positionNames)
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'players.csv')
+    writeCsv(path, ROWS)
+    table = openRosterCache(path, sep=';', positionNames=POSITIONS)
+    assert os.path.isdir(path + CACHE_SUFFIX)
+    assertSameTable(table, readPlayerTable(path, sep=';', positionNames=POSITIONS))
+    # the second open reads the binary roster
+    assertSameTable(openRosterCache(path, sep=';', positionNames=POSITIONS), table)
+
+def test_changed_csv_rebuilds(tmp_path, monkeypatch):
+    path = str(tmp_path / 'players.csv')
+    writeCsv(path, ROWS)
+    openRosterCache(path, sep=';', positionNames=POSITIONS)
+    writeCsv(path, ROWS[:3] + [("Nine", "attacker", 125, 21.0)])
+    table = openRosterCache(path, sep=';', positionNames=POSITIONS)
+    assert len(table) == 4 and table.values[3] == 125
+
+    # only the mtime changed: the hash matches and the roster is not parsed again
+    os.utime(path, ns=(0, 10 ** 9))
+    monkeypatch.setattr(roster_cache, 'readPlayerTable', None)
+    table = openRosterCache(path, sep=';', positionNames=POSITIONS)
+    assert len(table) == 4
+    assert readRosterMeta(path + CACHE_SUFFIX)['source']['mtime'] == 10 ** 9
+
+def test_other_settings_rebuild(tmp_path):
+    path = str(tmp_path / 'players.csv')
+    writeCsv(path, ROWS)
+    openRosterCache(path, sep=';', positionNames=POSITIONS)
+    table = openRosterCache(path, sep=';', positionNames=POSITIONS[:2])
+    assert tuple(table.positionNames) == POSITIONS[:2]
+    assert table.positions.tolist() == [0, 1, -1, -1, -1]
@@ -0,0 +1,39 @@
+import numpy as np
+
+from player_selector.envs.roster_features import RosterFeatures
+from player_selector.envs.formation import FORMATION_433
+
+def expectedFeatures(players, capacity, selected, budget, positionCounts):
+    features = np.zeros((len(capacity), 3))
+    for code in range(len(capacity)):
+        remaining = (players.positions == code) & ~selected & players.available
+        values, scores = players.values[remaining], players.scores[remaining]
+        slots = capacity[code] - positionCounts[code]
+        fits = values <= budget
+        features[code, 0] = scores[fits].max() if slots > 0 and fits.any() else 0.0
+        features[code, 1] = slots
+        features[code, 2] = np.sort(values)[:slots].sum() if slots > 0 else 0.0
+    return features
+
+def test_features_match_recomputation(roster):
+    rng = np.random.default_rng(0)
+    capacity = FORMATION_433.capacities(roster.positionNames)
+    features = RosterFeatures(roster, capacity)
+    selected = np.zeros(len(roster), dtype=bool)
+    for step in range(300):
+        playerId = int(rng.integers(len(roster)))
+        if selected[playerId]:
+            features.unpick(playerId)
+        else:
+            features.pick(playerId)
+        selected[playerId] = not selected[playerId]
+        if step % 50 == 25:
+            changed = rng.choice(len(roster), 5, replace=False)
+            roster.update(changed, values=rng.integers(10, 200, 5).astype(float),
+                          available=rng.random(5) < 0.7)
+            features.updatePlayers(changed, selected)
+        positionCounts = np.minimum(np.bincount(roster.positions[selected], minlength=len(capacity)), capacity)
+        budget = float(rng.integers(0, 400))
+        actual = features.update(budget, positionCounts)
+        np.testing.assert_allclose(actual, expectedFeatures(roster, capacity, selected, budget, positionCounts),
+                                   rtol=1e-6)
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+
+from player_selector.server import EnvServer, EnvClient
+
+@pytest.fixture
+def serverPath(tmp_path, roster):
+    path = str(tmp_path / 'env.sock')
+    server = EnvServer('PlayerSelector3-v0', 2, envKwargs={'players': roster, 'budget': 500}, batchWindow=0.01)
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    stop = asyncio.Event()
+
+    async def serve():
+        unixServer = await asyncio.start_unix_server(server.handleConnection, path)
+        ready.set()
+        async with unixServer:
+            await stop.wait()
+        server.close()
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    ready.wait(5)
+    yield path
+    loop.call_soon_threadsafe(stop.set)
+    thread.join(5)
+    loop.close()
+
+def test_round_trip_with_a_bad_action(serverPath, roster):
+    with EnvClient(serverPath) as client, EnvClient(serverPath) as other:
+        obs = client.reset()
+        assert obs.shape == (client.observationSize,) and obs[0] == 0
+        other.reset()
+        with pytest.raises(ValueError):
+            client.step(len(roster))
+        with pytest.raises(ValueError):
+            client.step(-1)
+        # both connections are still served
+        obs, reward, done = client.step(0)
+        assert obs[0] == 1 and reward == roster.scores[0] and not done
+        obs, reward, done = other.step(1)
+        assert obs[0] == 1 and reward == roster.scores[1]
+
+def test_full_server_refuses(serverPath):
+    with EnvClient(serverPath), EnvClient(serverPath):
+        with pytest.raises(ConnectionRefusedError):
+            EnvClient(serverPath)
@@ -0,0 +1,21 @@
+import numpy as np
+
+from player_selector.envs.playerselector3_env import PlayerSelector3Env
+
+def test_set_state_restores_the_episode(roster):
+    env = PlayerSelector3Env(players=roster, budget=500)
+    env.reset(seed=3)
+    for action in (0, 1, 2):
+        env.step(action)
+    snapshot = env.get_state()
+    mask = env.actionMask().copy()
+    expected = [env.step(action)[:3] for action in (5, 6, 7)]
+
+    env.reset(seed=9)
+    env.step(10)
+    env.set_state(snapshot)
+    assert (env.actionMask() == mask).all()
+    for action, (obs, reward, done) in zip((5, 6, 7), expected):
+        actual = env.step(action)
+        np.testing.assert_array_equal(actual[0], obs)
+        assert actual[1:3] == (reward, done)
@@ -0,0 +1,39 @@
+from itertools import combinations, product
+import numpy as np
+import pytest
+
+from player_selector.envs.player_table import PlayerTable
+from player_selector.envs.formation import POSITIONS, Formation, POSITION_GK, POSITION_DF, POSITION_MF, POSITION_ST
+from player_selector.solver import solveOptimalSquad
+
+FORMATION = Formation({POSITION_GK: 1, POSITION_DF: 2, POSITION_MF: 1, POSITION_ST: 1})
+
+def bruteForce(players, formation, budget):
+    perPosition = []
+    for code, position in enumerate(POSITIONS):
+        ids = np.flatnonzero(players.positions == code).tolist()
+        perPosition.append(list(combinations(ids, formation.slots.get(position, 0))))
+    best = None
+    for squad in product(*perPosition):
+        ids = [playerId for group in squad for playerId in group]
+        if players.values[ids].sum() <= budget:
+            score = players.scores[ids].sum()
+            best = score if best is None else max(best, score)
+    return best
+
+@pytest.mark.parametrize('seed', range(10))
+def test_solver_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n = 16
+    players = PlayerTable(['p{}'.format(i) for i in range(n)], rng.integers(1, 30, n), rng.integers(0, 50, n),
+                          np.arange(n) % len(POSITIONS), POSITIONS)
+    budget = int(rng.integers(20, 120))
+    expected = bruteForce(players, FORMATION, budget)
+    if expected is None:
+        return
+    squad = solveOptimalSquad(players, FORMATION, budget)
+    assert squad.score == pytest.approx(expected)
+    assert players.values[squad.playerIds].sum() <= budget
+    assert players.scores[squad.playerIds].sum() == pytest.approx(squad.score)
+    counts = np.bincount(players.positions[squad.playerIds], minlength=len(POSITIONS))
+    assert counts.tolist() == [FORMATION.slots[position] for position in POSITIONS]